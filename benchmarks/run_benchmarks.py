@@ -0,0 +1,326 @@
+"""Offline benchmarks for the survey pipeline.
+
+Runs every stage against synthetic PDFs and local stubs (no network, no GPU) and
+writes the results as JSON so they can be compared between commits:
+
+    python -m benchmarks.run_benchmarks --pages 5,20,100 --papers 1,4,16 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import src.utils.resilience as resilience_module
+from src.utils.extraction_cache import ExtractionCache
+from src.utils.pdf_handler import PDFHandler, PDFBatchProcessor
+from src.utils.rate_limiter import RateLimiter
+from src.utils.retrieval_index import RetrievalIndex
+from src.agents.gemini_agent import GeminiAgent
+from src.agents.deepseek_agent import AsyncDeepSeekAgent
+from src.agents.model_router import ModelRouter
+from src.models.survey_model import SurveyGenerator
+from src.models.survey_job import SurveyJob
+from config.settings import OUTPUT_DIR
+from .stubs import StubGeminiModel, StubOpenAIServer
+from .synthetic_pdfs import generate_corpus
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def _float_list(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v]
+
+def _str_list(value: str) -> List[str]:
+    return [v for v in value.split(",") if v]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _result(stage: str, params: Dict, seconds: float, items: int, unit: str, **extra) -> Dict:
+    return {
+        "stage": stage,
+        "params": params,
+        "latency_s": round(seconds, 6),
+        "throughput": round(items / seconds, 3) if seconds > 0 else None,
+        "throughput_unit": unit,
+        **extra
+    }
+
+def bench_process_pdf(workdir: str, pages_sweep: List[int], header_styles: List[str], repeats: int,
+                      body_sizes: List[float]) -> List[Dict]:
+    results = []
+    handler = PDFHandler()
+    for header_style in header_styles:
+        for pages in pages_sweep:
+            for body_size in body_sizes:
+                [pdf_path] = generate_corpus(os.path.join(workdir, "single"), 1, pages, header_style, body_size=body_size)
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    sections = handler.process_pdf(pdf_path)
+                    timings.append(time.perf_counter() - start)
+                best = min(timings)
+                results.append(_result(
+                    "pdf_handler.process_pdf",
+                    {"pages": pages, "header_style": header_style, "body_size": body_size},
+                    best, pages, "pages/s",
+                    sections_found=len(sections),
+                    header_spans=handler.last_stats.get("header_spans"),
+                    all_runs_s=[round(t, 6) for t in timings]
+                ))
+    return results
+
+def bench_outline(workdir: str, pages_sweep: List[int], appendix_pages: int, repeats: int) -> List[Dict]:
+    """Header detection over every page vs outline-driven extraction, on papers with a TOC and an appendix"""
+    results = []
+    for pages in pages_sweep:
+        [pdf_path] = generate_corpus(os.path.join(workdir, "outline"), 1, pages, outline=True,
+                                     appendix_pages=appendix_pages)
+        for use_outline in (False, True):
+            handler = PDFHandler(use_outline=use_outline)
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                sections = handler.process_pdf(pdf_path)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            results.append(_result(
+                "pdf_handler.process_pdf",
+                {"pages": pages, "appendix_pages": appendix_pages, "outline": use_outline},
+                best, pages + appendix_pages, "pages/s",
+                sections_found=len(sections),
+                pages_read=handler.last_stats.get("pages"),
+                all_runs_s=[round(t, 6) for t in timings]
+            ))
+    return results
+
+def bench_batch(workdir: str, papers_sweep: List[int], workers_sweep: List[int], pages: int) -> List[Dict]:
+    results = []
+    for papers in papers_sweep:
+        files = generate_corpus(os.path.join(workdir, "batch"), papers, pages)
+        for workers in workers_sweep:
+            # A fresh cache directory per run so every run measures cold extraction
+            cache = ExtractionCache(tempfile.mkdtemp(dir=workdir))
+            processor = PDFBatchProcessor(max_files=len(files), max_workers=workers, cache=cache)
+            start = time.perf_counter()
+            processor.process_uploaded_files(files)
+            elapsed = time.perf_counter() - start
+            results.append(_result(
+                "pdf_batch_processor.process_uploaded_files",
+                {"papers": papers, "pages": pages, "workers": workers},
+                elapsed, papers, "papers/s",
+                errors=len(processor.errors)
+            ))
+    return results
+
+def bench_summarization(workdir: str, papers_sweep: List[int], pages: int, latency: float, error_rate: float) -> List[Dict]:
+    results = []
+    for papers in papers_sweep:
+        files = generate_corpus(os.path.join(workdir, "batch"), papers, pages)
+        processor = PDFBatchProcessor(max_files=len(files), max_workers=1, cache=ExtractionCache(tempfile.mkdtemp(dir=workdir)))
+        all_sections = processor.process_uploaded_files(files)
+
+        for use_retrieval in (False, True):
+            agent = GeminiAgent(use_cache=False, use_retrieval=use_retrieval, use_router=False)
+            agent.model = StubGeminiModel(latency=latency, error_rate=error_rate)
+            agent.rate_limiter = RateLimiter(requests_per_minute=10 ** 6)
+            start = time.perf_counter()
+            index = RetrievalIndex.from_sections(all_sections) if use_retrieval else None
+            failed = 0
+            for section_name, contents in all_sections.items():
+                if contents:
+                    if index is not None:
+                        contents = agent.retrieve_passages(index, contents, section_name, "Texture Classification")
+                    try:
+                        agent.summarize_section_hierarchical(contents, section_name)
+                    except Exception:
+                        failed += 1
+            elapsed = time.perf_counter() - start
+            results.append(_result(
+                "gemini_agent.summarize",
+                {"papers": papers, "pages": pages, "latency": latency, "error_rate": error_rate,
+                 "retrieval": use_retrieval},
+                elapsed, agent.model.request_count, "calls/s",
+                calls=agent.model.request_count,
+                injected_429s=agent.model.error_count,
+                failed_sections=failed,
+                prompt_tokens=agent.model.prompt_tokens,
+                max_prompt_tokens=agent.model.max_prompt_tokens
+            ))
+    return results
+
+def bench_generation(concurrency_sweep: List[int], latency: float, completion_tokens: int) -> List[Dict]:
+    results = []
+    with StubOpenAIServer(latency=latency, completion_tokens=completion_tokens) as server:
+        generator = SurveyGenerator()
+        generator.async_deepseek_agent = AsyncDeepSeekAgent(use_cache=False, base_url=server.base_url)
+        summaries = {name: f"Summary of the {name} section." for name in generator.section_order}
+        for concurrency in concurrency_sweep:
+            generator.max_concurrent_sections = concurrency
+            start = time.perf_counter()
+            sections = asyncio.run(generator.generate_sections(summaries, "Texture Classification"))
+            elapsed = time.perf_counter() - start
+            results.append(_result(
+                "survey_generator.generate_sections",
+                {"sections": len(summaries), "concurrency": concurrency, "latency": latency,
+                 "completion_tokens": completion_tokens},
+                elapsed, len(sections), "sections/s"
+            ))
+    return results
+
+def bench_routing(calls: int, gemini_latency: float, error_rate: float, retry_after: float, llm_latency: float,
+                  completion_tokens: int) -> List[Dict]:
+    """Concurrent summarization calls against a throttled Gemini, with and without offloading to a local server.
+
+    Injected 429s carry a Retry-After of retry_after seconds: the unrouted run sits those out,
+    while the router sends the calls to the local server instead.
+    """
+    results = []
+    prompts = [f"Summarize paper {i}: " + "texture descriptors " * 200 for i in range(calls)]
+    with StubOpenAIServer(latency=llm_latency, completion_tokens=completion_tokens) as server:
+        for routed in (False, True):
+            agent = GeminiAgent(use_cache=False, use_router=False)
+            agent.model = StubGeminiModel(latency=gemini_latency, error_rate=error_rate, retry_after=retry_after)
+            agent.rate_limiter = RateLimiter(requests_per_minute=10 ** 6)
+            local_agent = AsyncDeepSeekAgent(use_cache=False, base_url=server.base_url)
+            if routed:
+                agent.router = ModelRouter(gemini_agent=agent, local_agent=local_agent,
+                                           prior_latency={"gemini": gemini_latency, "local": llm_latency})
+            # Don't let backoff left over from the previous run steer this one
+            time.sleep(resilience_module.cooldown_remaining("gemini"))
+            requests_before = server.request_count
+            start = time.perf_counter()
+            outcomes = asyncio.run(_run_summaries(agent, prompts))
+            elapsed = time.perf_counter() - start
+            results.append(_result(
+                "model_router.summarize",
+                {"calls": calls, "routed": routed, "gemini_latency": gemini_latency, "error_rate": error_rate,
+                 "retry_after": retry_after, "llm_latency": llm_latency},
+                elapsed, calls, "calls/s",
+                gemini_calls=agent.model.request_count,
+                injected_429s=agent.model.error_count,
+                local_calls=server.request_count - requests_before,
+                failed_calls=sum(1 for outcome in outcomes if isinstance(outcome, Exception))
+            ))
+    return results
+
+async def _run_summaries(agent: GeminiAgent, prompts: List[str]) -> List:
+    return await asyncio.gather(*(agent._generate_async(prompt) for prompt in prompts), return_exceptions=True)
+
+def bench_pipeline(workdir: str, papers_sweep: List[int], pages: int, gemini_latency: float,
+                   llm_latency: float, completion_tokens: int) -> List[Dict]:
+    """Summarize-then-generate run serially versus as overlapping stages"""
+    results = []
+    with StubOpenAIServer(latency=llm_latency, completion_tokens=completion_tokens) as server:
+        for papers in papers_sweep:
+            files = generate_corpus(os.path.join(workdir, "batch"), papers, pages)
+            for mode in ("serial", "pipelined"):
+                generator = SurveyGenerator()
+                generator.gemini_agent = GeminiAgent(use_cache=False, use_router=False)
+                generator.gemini_agent.model = StubGeminiModel(latency=gemini_latency)
+                generator.gemini_agent.rate_limiter = RateLimiter(requests_per_minute=10 ** 6)
+                generator.gemini_agent.pdf_processor = PDFBatchProcessor(
+                    max_files=len(files), max_workers=1, cache=ExtractionCache(tempfile.mkdtemp(dir=workdir))
+                )
+                generator.async_deepseek_agent = AsyncDeepSeekAgent(use_cache=False, base_url=server.base_url)
+                job = SurveyJob(f"bench-{mode}-{papers}", "Texture Classification", files,
+                                jobs_dir=tempfile.mkdtemp(dir=workdir))
+                start = time.perf_counter()
+                sections = asyncio.run(_run_pipeline(generator, job, mode == "pipelined"))
+                elapsed = time.perf_counter() - start
+                results.append(_result(
+                    "survey_generator.pipeline",
+                    {"papers": papers, "pages": pages, "mode": mode, "gemini_latency": gemini_latency,
+                     "llm_latency": llm_latency},
+                    elapsed, len(sections), "sections/s"
+                ))
+    return results
+
+async def _run_pipeline(generator: SurveyGenerator, job: SurveyJob, pipelined: bool) -> Dict[str, str]:
+    if not pipelined:
+        summaries = await asyncio.to_thread(generator.prepare_summaries, job)
+        return await generator.generate_sections(summaries, job.research_area)
+    existing, inputs = await generator.prepare_pipeline(job)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    summarizing = asyncio.create_task(
+        generator.summarize_into(job, existing, inputs, queue, generator.max_concurrent_sections)
+    )
+    sections = await generator.generate_from_queue(queue, job.research_area)
+    await summarizing
+    return sections
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=_int_list, default=[5, 20, 100], help="page counts for single-PDF runs")
+    parser.add_argument("--papers", type=_int_list, default=[1, 4, 16], help="paper counts for batch runs")
+    parser.add_argument("--workers", type=_int_list, default=[1, os.cpu_count() or 1], help="extraction worker counts")
+    parser.add_argument("--header-styles", type=_str_list, default=["bold", "large"], help="synthetic header styles")
+    parser.add_argument("--body-sizes", type=_float_list, default=[9.0, 11.0], help="synthetic body font sizes")
+    parser.add_argument("--batch-pages", type=int, default=12, help="pages per paper in batch runs")
+    parser.add_argument("--appendix-pages", type=int, default=20, help="appendix pages after the references in outline runs")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--gemini-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="fraction of Gemini calls failing with 429")
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="base backoff delay used when retrying 429s")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-tokens", type=int, default=200)
+    parser.add_argument("--route-calls", type=int, default=24, help="concurrent summarization calls in routing runs")
+    parser.add_argument("--route-error-rate", type=float, default=0.5, help="fraction of Gemini calls failing with 429 in routing runs")
+    parser.add_argument("--route-retry-after", type=float, default=2.0, help="Retry-After seconds on 429s in routing runs")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 3, 6], help="section generation concurrency")
+    parser.add_argument("--stages", type=_str_list, default=["pdf", "outline", "batch", "summarize", "generate", "route", "pipeline"])
+    parser.add_argument("--output", default=None, help="JSON output path")
+    args = parser.parse_args(argv)
+
+    # Keep injected 429s from sleeping for the production retry delay; read when agents are built
+    resilience_module.LLM_RETRY_BASE_DELAY = args.retry_delay
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        if "pdf" in args.stages:
+            results += bench_process_pdf(workdir, args.pages, args.header_styles, args.repeats, args.body_sizes)
+        if "outline" in args.stages:
+            results += bench_outline(workdir, args.pages, args.appendix_pages, args.repeats)
+        if "batch" in args.stages:
+            results += bench_batch(workdir, args.papers, args.workers, args.batch_pages)
+        if "summarize" in args.stages:
+            results += bench_summarization(workdir, args.papers, args.batch_pages, args.gemini_latency, args.gemini_error_rate)
+        if "generate" in args.stages:
+            results += bench_generation(args.concurrency, args.llm_latency, args.llm_tokens)
+        if "route" in args.stages:
+            results += bench_routing(args.route_calls, args.gemini_latency, args.route_error_rate,
+                                     args.route_retry_after, args.llm_latency, args.llm_tokens)
+        if "pipeline" in args.stages:
+            results += bench_pipeline(workdir, args.papers, args.batch_pages, args.gemini_latency,
+                                      args.llm_latency, args.llm_tokens)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        os.path.dirname(OUTPUT_DIR), "benchmarks", f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    for result in results:
+        print(f"{result['stage']:45s} {json.dumps(result['params']):80s} {result['latency_s']:10.4f}s {result['throughput']} {result['throughput_unit']}")
+    print(f"Results written to: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Cold-start benchmark: import time of the app modules and cost of building the pipeline objects.
+
+Each measurement runs in a fresh interpreter so module caches don't hide import cost:
+
+    python -m benchmarks.startup --repeats 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from .run_benchmarks import _git_commit
+
+SCENARIOS = {
+    "import_settings": "import config.settings",
+    "import_survey_model": "import src.models.survey_model",
+    "import_gradio_app": "import src.interface.gradio_app",
+    "construct_survey_generator": (
+        "from src.models.survey_model import SurveyGenerator, SurveyProgress\n"
+        "SurveyGenerator(); SurveyProgress()"
+    ),
+    "construct_gradio_interface": (
+        "from src.interface.gradio_app import GradioInterface\n"
+        "GradioInterface()"
+    ),
+}
+
+TIMER = (
+    "import time\n"
+    "_start = time.perf_counter()\n"
+    "{code}\n"
+    "print(time.perf_counter() - _start)\n"
+)
+
+def measure(code: str, repeats: int):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, "-c", TIMER.format(code=code)],
+            cwd=root,
+            text=True
+        )
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None, help="JSON output path")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, code in SCENARIOS.items():
+        timings = measure(code, args.repeats)
+        results.append({
+            "stage": f"startup.{name}",
+            "params": {"repeats": args.repeats},
+            "latency_s": round(statistics.median(timings), 6),
+            "all_runs_s": [round(t, 6) for t in timings]
+        })
+        print(f"{name:30s} median {statistics.median(timings) * 1000:8.1f} ms")
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Optional
+
+STUB_WORDS = "the survey shows that recent methods improve texture classification accuracy".split()
+
+def _stub_text(tokens: int) -> str:
+    return " ".join(STUB_WORDS[i % len(STUB_WORDS)] for i in range(tokens))
+
+class StubOpenAIServer:
+    """Minimal OpenAI-compatible chat completions server standing in for LM Studio.
+
+    Each request takes `latency` seconds plus completion_tokens / tokens_per_second,
+    and supports both regular and stream=True responses.
+    """
+    def __init__(self, port: int = 0, latency: float = 0.05, completion_tokens: int = 200,
+                 tokens_per_second: float = 2000.0):
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.tokens_per_second = tokens_per_second
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json({"object": "list", "data": [{"id": "local-model", "object": "model"}]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.request_count += 1
+                tokens = min(stub.completion_tokens, request.get("max_tokens") or stub.completion_tokens)
+                time.sleep(stub.latency)
+                created = int(time.time())
+
+                if request.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for i in range(tokens):
+                        time.sleep(1 / stub.tokens_per_second)
+                        chunk = {
+                            "id": "stub", "object": "chat.completion.chunk", "created": created, "model": "local-model",
+                            "choices": [{"index": 0, "delta": {"content": STUB_WORDS[i % len(STUB_WORDS)] + " "}, "finish_reason": None}]
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    done = {
+                        "id": "stub", "object": "chat.completion.chunk", "created": created, "model": "local-model",
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                    return
+
+                time.sleep(tokens / stub.tokens_per_second)
+                prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+                self._send_json({
+                    "id": "stub", "object": "chat.completion", "created": created, "model": "local-model",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": _stub_text(tokens)}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens, "total_tokens": prompt_tokens + tokens}
+                })
+
+        return Handler
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class StubGeminiModel:
+    """Drop-in replacement for genai.GenerativeModel with configurable latency and 429 injection.
+
+    When retry_after is set, injected 429s ask the caller to retry after that many seconds,
+    the way Gemini's quota errors do.
+    """
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, completion_tokens: int = 300, seed: int = 0,
+                 retry_after: Optional[float] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.completion_tokens = completion_tokens
+        self.request_count = 0
+        self.error_count = 0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt: str):
+        prompt_tokens = len(prompt) // 4
+        with self._lock:
+            self.request_count += 1
+            throttled = self._rng.random() < self.error_rate
+            if throttled:
+                self.error_count += 1
+            else:
+                self.prompt_tokens += prompt_tokens
+                self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+        if throttled:
+            hint = "" if self.retry_after is None else f" Please retry in {self.retry_after}s."
+            raise Exception("429 Resource has been exhausted (e.g. check quota)." + hint)
+        return SimpleNamespace(
+            text=_stub_text(self.completion_tokens),
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=self.completion_tokens,
+                total_token_count=prompt_tokens + self.completion_tokens
+            )
+        )
+
+    def generate_content(self, prompt: str, **kwargs):
+        time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._respond(prompt)
@@ -0,0 +1,89 @@
+import os
+import random
+from typing import List
+import fitz  # PyMuPDF
+
+WORDS = (
+    "model data training network feature learning results method approach performance "
+    "dataset accuracy baseline proposed analysis texture classification layer deep "
+    "evaluation experiment framework representation task loss optimization benchmark"
+).split()
+
+SECTION_TITLES = [
+    "1. Introduction",
+    "2. Related Work",
+    "3. Proposed Method",
+    "4. Experiments",
+    "5. Discussion",
+    "6. Conclusion",
+    "References",
+]
+
+# Header styles: (fontname, fontsize) for 9pt body text; sizes scale with body_size
+HEADER_STYLES = {
+    "bold": ("hebo", 9),
+    "large": ("helv", 14),
+    "bold_large": ("hebo", 14),
+}
+BODY_FONT = ("helv", 9)
+LINE_HEIGHT = 12
+MARGIN = 54
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "."
+
+APPENDIX_TITLE = "Appendix A. Supplementary Material"
+
+def generate_paper(path: str, pages: int, header_style: str = "bold", seed: int = 0, body_size: float = BODY_FONT[1],
+                   outline: bool = False, appendix_pages: int = 0) -> str:
+    """Write a synthetic paper with `pages` pages and the usual section headers.
+
+    appendix_pages more pages follow the references, and outline embeds a table
+    of contents pointing at every header.
+    """
+    rng = random.Random(seed)
+    header_font, header_size = HEADER_STYLES[header_style]
+    header_size = header_size * body_size / BODY_FONT[1]
+    line_height = LINE_HEIGHT * body_size / BODY_FONT[1]
+    doc = fitz.open()
+    # Spread the section headers evenly over the document
+    header_pages = {int(i * pages / len(SECTION_TITLES)): title for i, title in enumerate(SECTION_TITLES)}
+    if appendix_pages:
+        header_pages[pages] = APPENDIX_TITLE
+
+    for page_number in range(pages + appendix_pages):
+        page = doc.new_page()
+        y = MARGIN
+        if page_number == 0:
+            page.insert_text((MARGIN, y), "A Synthetic Paper About Texture Classification", fontname="hebo", fontsize=16)
+            y += 2 * line_height
+        if page_number in header_pages:
+            page.insert_text((MARGIN, y + line_height), header_pages[page_number], fontname=header_font, fontsize=header_size)
+            y += 2 * line_height
+        while y < page.rect.height - MARGIN:
+            y += line_height
+            page.insert_text((MARGIN, y), _sentence(rng), fontname=BODY_FONT[0], fontsize=body_size)
+
+    if outline:
+        doc.set_toc([[1, title, page_number + 1] for page_number, title in sorted(header_pages.items())])
+    doc.save(path)
+    doc.close()
+    return path
+
+def generate_corpus(directory: str, papers: int, pages: int, header_style: str = "bold", seed: int = 0,
+                    body_size: float = BODY_FONT[1], outline: bool = False, appendix_pages: int = 0) -> List[str]:
+    """Generate `papers` distinct synthetic papers in `directory`"""
+    os.makedirs(directory, exist_ok=True)
+    suffix = f"{'_toc' if outline else ''}{f'_{appendix_pages}a' if appendix_pages else ''}"
+    return [
+        generate_paper(
+            os.path.join(directory, f"paper_{header_style}_{pages}p_{body_size:g}pt{suffix}_{i}.pdf"),
+            pages,
+            header_style,
+            seed=seed + i,
+            body_size=body_size,
+            outline=outline,
+            appendix_pages=appendix_pages
+        )
+        for i in range(papers)
+    ]
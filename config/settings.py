@@ -16,5 +16,115 @@ TEMP_DIR = "output/temp"
 
 # Rate limiting settings
 GEMINI_REQUESTS_PER_MINUTE = 60
+GEMINI_TOKENS_PER_MINUTE = None  # set to enforce a tokens-per-minute quota as well
 RETRY_ATTEMPTS = 3
-RETRY_DELAY = 20
\ No newline at end of file
+RETRY_DELAY = 20
+
+# Local LLM (LM Studio) settings
+LOCAL_LLM_BASE_URL = "http://127.0.0.1:1234/v1"
+# Comma-separated OpenAI-compatible endpoints; requests are balanced across all of them
+LOCAL_LLM_ENDPOINTS = [url.strip() for url in os.getenv("LOCAL_LLM_ENDPOINTS", LOCAL_LLM_BASE_URL).split(",") if url.strip()]
+LOCAL_LLM_MAX_CONCURRENCY_PER_ENDPOINT = 4
+LOCAL_LLM_HEALTH_CHECK_INTERVAL = 30  # seconds before a failed endpoint is retried
+MAX_CONCURRENT_SECTIONS = 6
+
+# PDF extraction settings
+MAX_PDF_FILES = 10
+PDF_EXTRACTION_WORKERS = os.cpu_count() or 1
+PDF_EXTRACTION_TIMEOUT = 120  # seconds per file
+
+# PDF extraction cache settings
+EXTRACTION_CACHE_DIR = os.path.join(TEMP_DIR, "extraction_cache")
+EXTRACTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# LLM response cache settings
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_PATH = os.path.join(TEMP_DIR, "response_cache.sqlite3")
+RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = 10000
+
+# Hierarchical (map-reduce) summarization settings
+SUMMARY_TOKEN_BUDGET = 24000  # max estimated content tokens per Gemini prompt
+SUMMARY_MAP_CONCURRENCY = 4
+
+# Streaming extraction settings for very long PDFs
+PDF_STREAMING_PAGE_THRESHOLD = 100  # PDFs with more pages are extracted section by section
+PDF_MAX_PAGES = None  # stop reading after this many pages
+PDF_MAX_SECTION_CHARS = 500000  # per-section buffer ceiling in streaming and outline modes
+PDF_USE_OUTLINE = True  # locate sections from the PDF's embedded outline when it has one, reading only their pages
+
+# Metrics and tracing settings
+METRICS_ENABLED = True
+METRICS_JSONL_PATH = os.path.join(TEMP_DIR, "metrics.jsonl")
+METRICS_PORT = None  # serve Prometheus metrics on this port when set
+
+# Survey job checkpoint settings
+JOBS_DIR = os.path.join(TEMP_DIR, "jobs")
+
+# Job scheduler settings
+SCHEDULER_WORKERS = 2  # surveys generated at the same time
+SCHEDULER_MAX_QUEUE = 20  # queued surveys before new submissions are rejected
+SCHEDULER_HISTORY_SIZE = 100  # finished jobs kept for status polling
+LLM_MAX_CONCURRENT_CALLS = 8  # in-flight LLM requests across all jobs
+
+# Retrieval settings: summarize only the passages most relevant to each section
+RETRIEVAL_ENABLED = True
+RETRIEVAL_TOP_K = 12  # passages per section prompt
+RETRIEVAL_CHUNK_TOKENS = 400  # estimated tokens per indexed passage
+RETRIEVAL_HASH_DIM = 2 ** 14  # width of the hashed TF-IDF vectors
+RETRIEVAL_EMBEDDING_MODEL = None  # local transformers model name to use embeddings instead of TF-IDF
+
+# Near-duplicate elimination settings, applied across papers before summarization
+DEDUP_ENABLED = True
+DEDUP_SIMILARITY_THRESHOLD = 0.8  # estimated Jaccard similarity at which a sentence counts as repeated
+DEDUP_SHINGLE_SIZE = 5  # words per shingle
+DEDUP_NUM_PERM = 128  # MinHash signature length
+
+# Header detection settings, relative to each document's body font size
+HEADER_SIZE_RATIO = 1.15  # spans at least this much larger than body text are headers
+HEADER_MAX_CHARS = 150  # longer spans are never headers
+HEADER_MAX_BOLD_FRACTION = 0.3  # bold marks headers only while less of the text than this is bold
+HEADER_SAMPLE_PAGES = 10  # leading pages the body font size and bold fraction are estimated from
+
+# Survey length planning: completion budgets per section, derived from MIN_PAGES/MAX_PAGES
+TOKENS_PER_PAGE = 750  # estimated tokens of LaTeX source per compiled page
+SECTION_TOKEN_WEIGHTS = {
+    'introduction': 0.12,
+    'background': 0.22,
+    'methodology': 0.25,
+    'results': 0.20,
+    'discussion': 0.13,
+    'conclusion': 0.08
+}
+SECTION_MIN_TOKENS = 400
+SECTION_MAX_TOKENS = 8000  # per-request completion limit of the local model
+SECTION_TOKEN_HEADROOM = 1.2  # max_tokens as a multiple of the section's target
+
+# Pipeline settings
+PIPELINE_QUEUE_SIZE = 2  # summaries waiting for a free generation worker before summarization pauses
+
+# Resilience settings for LLM calls
+GEMINI_TIMEOUT = 120  # seconds per Gemini request
+LOCAL_LLM_TIMEOUT = 600  # seconds per section generation request
+LOCAL_LLM_STREAM_IDLE_TIMEOUT = 60  # seconds without a streamed token before giving up
+LLM_RETRY_BASE_DELAY = 2.0  # first backoff step; doubles per attempt, with full jitter
+LLM_RETRY_MAX_DELAY = 60.0
+CIRCUIT_BREAKER_FAILURES = 5  # consecutive failures before a backend's circuit opens
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30  # seconds before an open circuit lets a probe through
+HEDGE_MIN_SAMPLES = 20  # latencies observed before hedging kicks in
+GEMINI_HEDGE_PERCENTILE = None  # hedging spends quota, so it is off for Gemini by default
+LOCAL_LLM_HEDGE_PERCENTILE = 95  # used only when several local endpoints are configured
+
+# Incremental survey update settings
+LIVING_SURVEYS_DIR = os.path.join(TEMP_DIR, "living_surveys")
+INCREMENTAL_REGENERATE_FRACTION = 0.1  # regenerate a section once papers added or removed since it was written make up this share of its source text
+
+# Model routing settings: which backends may serve each kind of call, chosen by expected finish time
+ROUTER_ENABLED = True
+ROUTER_TASK_BACKENDS = {
+    "summarize": ["gemini", "local"],
+    "generate": ["local"]  # add "gemini" to let Gemini write sections when the local servers are saturated
+}
+ROUTER_PRIOR_LATENCY = {"gemini": 10.0, "local": 60.0}  # seconds per call assumed until latencies are observed
+ROUTER_MIN_SAMPLES = 5  # observed calls per backend and task before their median replaces the prior
+LOCAL_LLM_MAX_PROMPT_TOKENS = 16000  # longer prompts are never routed to the local servers
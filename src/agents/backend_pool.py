@@ -0,0 +1,256 @@
+import asyncio
+import threading
+import time
+import urllib.request
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, TypeVar
+from ..utils.metrics import get_metrics
+from config.settings import (
+    LOCAL_LLM_ENDPOINTS,
+    LOCAL_LLM_MAX_CONCURRENCY_PER_ENDPOINT,
+    LOCAL_LLM_HEALTH_CHECK_INTERVAL
+)
+
+T = TypeVar("T")
+
+class NoBackendAvailableError(Exception):
+    """Raised when every endpoint in the pool has failed or is marked unhealthy"""
+
+def is_connection_error(error: Exception) -> bool:
+    """Whether an error means the endpoint is unreachable, as opposed to a bad request"""
+    try:
+        from openai import APIConnectionError
+        if isinstance(error, APIConnectionError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+class LLMBackend:
+    """One OpenAI-compatible inference server and its live load"""
+    def __init__(self, base_url: str, max_concurrency: int):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.total_requests = 0
+        self.healthy = True
+        self.last_failure = 0.0
+        self._client = None
+        self._async_client = None
+        self._async_client_loop = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(
+                        base_url=self.base_url,
+                        api_key="not-needed",  # LM Studio doesn't require an API key for local inference
+                        max_retries=0  # retries belong to the pool's failover and the agent's ResiliencePolicy
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        # The async HTTP connection pool is bound to an event loop, so keep one client per loop
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(base_url=self.base_url, api_key="not-needed", max_retries=0)
+            self._async_client_loop = loop
+        return self._async_client
+
+    def __repr__(self):
+        return f"LLMBackend({self.base_url!r}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+class BackendPool:
+    """Routes requests across several local inference servers.
+
+    Each request goes to the healthy endpoint with the fewest outstanding requests,
+    never exceeding an endpoint's concurrency cap. Connection failures mark an
+    endpoint unhealthy and the request fails over to the next one; unhealthy
+    endpoints are tried again after health_check_interval seconds or once a health
+    check succeeds.
+    """
+    def __init__(self,
+                 endpoints: Iterable[str] = LOCAL_LLM_ENDPOINTS,
+                 max_concurrency_per_endpoint: int = LOCAL_LLM_MAX_CONCURRENCY_PER_ENDPOINT,
+                 health_check_interval: float = LOCAL_LLM_HEALTH_CHECK_INTERVAL,
+                 poll_interval: float = 0.05):
+        self.backends: List[LLMBackend] = [LLMBackend(url, max_concurrency_per_endpoint) for url in endpoints]
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one endpoint")
+        self.health_check_interval = health_check_interval
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def _available(self, backend: LLMBackend, now: float) -> bool:
+        return backend.healthy or now - backend.last_failure >= self.health_check_interval
+
+    def _try_acquire(self, exclude: Set[LLMBackend]) -> Optional[LLMBackend]:
+        """Reserve the least loaded usable backend; raise if none could ever be used (call with lock held)"""
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and self._available(b, now)]
+        if not candidates:
+            raise NoBackendAvailableError(
+                f"No healthy local LLM endpoint available (tried {len(exclude)} of {len(self.backends)})"
+            )
+        free = [b for b in candidates if b.outstanding < b.max_concurrency]
+        if not free:
+            return None
+        backend = min(free, key=lambda b: (b.outstanding, b.total_requests))
+        backend.outstanding += 1
+        backend.total_requests += 1
+        return backend
+
+    def capacity(self) -> int:
+        """Request slots across the endpoints that can currently be used"""
+        now = time.monotonic()
+        with self._condition:
+            return sum(b.max_concurrency for b in self.backends if self._available(b, now))
+
+    def outstanding(self) -> int:
+        with self._condition:
+            return sum(b.outstanding for b in self.backends)
+
+    def acquire(self, exclude: Optional[Set[LLMBackend]] = None) -> LLMBackend:
+        """Block until a backend has a free slot and reserve it"""
+        exclude = exclude or set()
+        with self._condition:
+            while True:
+                backend = self._try_acquire(exclude)
+                if backend is not None:
+                    return backend
+                self._condition.wait(timeout=self.poll_interval)
+
+    async def acquire_async(self, exclude: Optional[Set[LLMBackend]] = None) -> LLMBackend:
+        """Wait without blocking the event loop until a backend has a free slot and reserve it"""
+        exclude = exclude or set()
+        while True:
+            with self._condition:
+                backend = self._try_acquire(exclude)
+            if backend is not None:
+                return backend
+            await asyncio.sleep(self.poll_interval)
+
+    def release(self, backend: LLMBackend, error: Optional[Exception] = None, cancelled: bool = False):
+        """Free a backend slot, marking the backend unhealthy if it was unreachable.
+
+        A cancelled request (a timeout or a losing hedge) says nothing about the
+        endpoint's health, so it only frees the slot.
+        """
+        with self._condition:
+            backend.outstanding -= 1
+            if cancelled:
+                pass
+            elif error is not None and is_connection_error(error):
+                backend.healthy = False
+                backend.last_failure = time.monotonic()
+            elif error is None:
+                backend.healthy = True
+            self._condition.notify_all()
+        if cancelled:
+            status = "cancelled"
+        else:
+            status = "ok" if error is None else ("connection_error" if is_connection_error(error) else "error")
+        get_metrics().inc("backend_requests_total", endpoint=backend.base_url, status=status)
+
+    def call(self, fn: Callable[[LLMBackend], T]) -> T:
+        """Run fn against a backend, failing over to the others on connection errors"""
+        tried: Set[LLMBackend] = set()
+        last_error = None
+        while True:
+            try:
+                backend = self.acquire(tried)
+            except NoBackendAvailableError as e:
+                raise e from last_error
+            try:
+                result = fn(backend)
+            except Exception as e:
+                self.release(backend, e)
+                if not is_connection_error(e):
+                    raise
+                last_error = e
+                tried.add(backend)
+                print(f"Local LLM endpoint {backend.base_url} unreachable, failing over: {str(e)}")
+                continue
+            except BaseException:
+                # Cancelled, e.g. by a timeout or a losing hedge; the slot must still be freed
+                self.release(backend, cancelled=True)
+                raise
+            self.release(backend)
+            return result
+
+    async def call_async(self, fn: Callable[[LLMBackend], Awaitable[T]]) -> T:
+        """Await fn against a backend, failing over to the others on connection errors"""
+        tried: Set[LLMBackend] = set()
+        last_error = None
+        while True:
+            try:
+                backend = await self.acquire_async(tried)
+            except NoBackendAvailableError as e:
+                raise e from last_error
+            try:
+                result = await fn(backend)
+            except Exception as e:
+                self.release(backend, e)
+                if not is_connection_error(e):
+                    raise
+                last_error = e
+                tried.add(backend)
+                print(f"Local LLM endpoint {backend.base_url} unreachable, failing over: {str(e)}")
+                continue
+            except BaseException:
+                # Cancelled, e.g. by a timeout or a losing hedge; the slot must still be freed
+                self.release(backend, cancelled=True)
+                raise
+            self.release(backend)
+            return result
+
+    def check_health(self, backend: LLMBackend, timeout: float = 2.0) -> bool:
+        """Probe an endpoint's /models route and update its health"""
+        try:
+            with urllib.request.urlopen(f"{backend.base_url}/models", timeout=timeout) as response:
+                healthy = 200 <= response.status < 300
+        except Exception:
+            healthy = False
+        with self._condition:
+            backend.healthy = healthy
+            if not healthy:
+                backend.last_failure = time.monotonic()
+            self._condition.notify_all()
+        get_metrics().event("backend_health", endpoint=backend.base_url, healthy=healthy)
+        return healthy
+
+    def check_all(self) -> List[bool]:
+        return [self.check_health(backend) for backend in self.backends]
+
+    def start_health_checks(self):
+        """Probe every endpoint every health_check_interval seconds in a daemon thread"""
+        if self._health_thread is not None:
+            return
+
+        def run():
+            while True:
+                self.check_all()
+                time.sleep(self.health_check_interval)
+
+        self._health_thread = threading.Thread(target=run, name="llm-health-checks", daemon=True)
+        self._health_thread.start()
+
+_shared_pool: Optional[BackendPool] = None
+_shared_pool_lock = threading.Lock()
+
+def get_backend_pool() -> BackendPool:
+    """Return the process-wide pool over LOCAL_LLM_ENDPOINTS"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = BackendPool()
+            # With a single endpoint there is nothing to fail over to, so live requests are probe enough
+            if len(_shared_pool.backends) > 1:
+                _shared_pool.start_health_checks()
+        return _shared_pool
@@ -1,39 +1,116 @@
-from openai import OpenAI
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
 import time
+from ..utils.response_cache import ResponseCache, get_response_cache
+from ..utils.metrics import record_llm_call
+from ..utils.token_utils import estimate_tokens
+from ..utils.concurrency import get_concurrency_limiter
+from ..utils.resilience import ResiliencePolicy, is_retryable
+from .backend_pool import BackendPool, LLMBackend, NoBackendAvailableError, get_backend_pool, is_connection_error
+from config.settings import (
+    RESPONSE_CACHE_ENABLED,
+    LLM_MAX_CONCURRENT_CALLS,
+    LOCAL_LLM_TIMEOUT,
+    LOCAL_LLM_STREAM_IDLE_TIMEOUT,
+    LOCAL_LLM_HEDGE_PERCENTILE
+)
 
 class DeepSeekAgent:
-    def __init__(self):
-        self.client = OpenAI(
-            base_url="http://127.0.0.1:1234/v1",
-            api_key="not-needed"  # LM Studio doesn't require an API key for local inference
-        )
+    def __init__(self,
+                 cache: Optional[ResponseCache] = None,
+                 use_cache: bool = RESPONSE_CACHE_ENABLED,
+                 base_url: Optional[str] = None,
+                 pool: Optional[BackendPool] = None):
+        # Requests are balanced over the shared LOCAL_LLM_ENDPOINTS pool unless a single
+        # base_url or a dedicated pool is given
+        if pool is None:
+            pool = BackendPool([base_url]) if base_url else get_backend_pool()
+        self.pool = pool
         self.request_counter = 0
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        # Shared with every other agent and job in the process
+        self.llm_slots = get_concurrency_limiter("llm", LLM_MAX_CONCURRENT_CALLS)
+        # A hedged duplicate only helps when it can land on another endpoint
+        hedge_percentile = LOCAL_LLM_HEDGE_PERCENTILE if len(self.pool.backends) > 1 else None
+        self.policy = ResiliencePolicy("local", timeout=LOCAL_LLM_TIMEOUT, hedge_percentile=hedge_percentile)
+        # Streams can't be hedged or replayed once tokens flow, so only opening them is retried
+        self.stream_policy = ResiliencePolicy("local", timeout=LOCAL_LLM_STREAM_IDLE_TIMEOUT)
 
-    def generate_section(self, prompt: str, section_name: str) -> str:
-        """Generate section content using local LLM through LM Studio"""
-        try:
-            system_prompt = f"""You are an expert academic writer. 
+    def _build_messages(self, prompt: str, section_name: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a section generation request"""
+        system_prompt = f"""You are an expert academic writer. 
             Your task is to generate a detailed {section_name} section for a survey paper.
             The content should be well-structured, comprehensive, and in LaTeX format.
             Use appropriate LaTeX commands for sections, subsections, and mathematical formulas if needed."""
 
-            response = self.client.chat.completions.create(
-                model="local-model",  # This is ignored by LM Studio but required by the API
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000,  # Adjust based on your needs
-                top_p=0.95,
-                frequency_penalty=0.1,
-                presence_penalty=0.1
-            )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _completion_params(self, max_tokens: Optional[int] = None) -> Dict:
+        """Sampling parameters shared by every section generation request"""
+        return dict(
+            model="local-model",  # This is ignored by LM Studio but required by the API
+            temperature=0.7,
+            max_tokens=max_tokens or 4000,  # per-section budget from the planner when given
+            top_p=0.95,
+            frequency_penalty=0.1,
+            presence_penalty=0.1
+        )
+
+    def _cache_key(self, messages: List[Dict[str, str]], params: Dict) -> Optional[str]:
+        """Response cache key for a request, or None when caching is disabled"""
+        if self.cache is None:
+            return None
+        sampling = {k: v for k, v in params.items() if k != "model"}
+        return self.cache.make_key(params["model"], messages[0]["content"], messages[1]["content"], sampling)
+
+    def _record_response(self, response, started_at: float, section_name: str):
+        """Record latency and token usage of a completed chat completion"""
+        usage = getattr(response, "usage", None)
+        record_llm_call(
+            "local",
+            time.perf_counter() - started_at,
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            section=section_name
+        )
+
+    def _request(self, messages: List[Dict[str, str]], params: Dict, section_name: str):
+        """One chat completion attempt on the least busy endpoint"""
+        with self.llm_slots:
+            started_at = time.perf_counter()  # exclude slot wait
+            try:
+                response = self.pool.call(lambda backend: backend.client.chat.completions.create(
+                    messages=messages,
+                    timeout=self.policy.timeout,
+                    **params
+                ))
+            except Exception:
+                record_llm_call("local", time.perf_counter() - started_at, status="error", section=section_name)
+                raise
+        self._record_response(response, started_at, section_name)
+        return response
+
+    def generate_section(self, prompt: str, section_name: str, bypass_cache: bool = False,
+                         max_tokens: Optional[int] = None) -> str:
+        """Generate section content using local LLM through LM Studio"""
+        try:
+            messages = self._build_messages(prompt, section_name)
+            params = self._completion_params(max_tokens)
+            cache_key = self._cache_key(messages, params)
+            if cache_key is not None and not bypass_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return self._format_latex_section(section_name, cached)
+
+            response = self.policy.call(lambda: self._request(messages, params, section_name))
             
             generated_text = response.choices[0].message.content
             self.request_counter += 1
-            print(self.request_counter)
+            if cache_key is not None:
+                self.cache.put(cache_key, generated_text, params["model"])
             return self._format_latex_section(section_name, generated_text)
         
         except Exception as e:
@@ -56,4 +133,161 @@ class DeepSeekAgent:
     def _clean_latex_content(self, content: str) -> str:
         """Clean and validate LaTeX content"""
         # Add any specific LaTeX cleaning or validation logic here
-        return content
\ No newline at end of file
+        return content
+
+class AsyncDeepSeekAgent(DeepSeekAgent):
+    """DeepSeek agent built on the async OpenAI client so sections can be generated concurrently"""
+    async def _request_async(self, messages: List[Dict[str, str]], params: Dict, section_name: str):
+        async with self.llm_slots:
+            started_at = time.perf_counter()  # exclude slot wait
+            try:
+                response = await self.pool.call_async(lambda backend: backend.async_client.chat.completions.create(
+                    messages=messages,
+                    timeout=self.policy.timeout,
+                    **params
+                ))
+            except BaseException:
+                # Cancelled hedges and timed-out attempts count as failed calls too
+                record_llm_call("local", time.perf_counter() - started_at, status="error", section=section_name)
+                raise
+        self._record_response(response, started_at, section_name)
+        return response
+
+    async def generate_section(self, prompt: str, section_name: str, bypass_cache: bool = False,
+                               max_tokens: Optional[int] = None) -> str:
+        """Generate section content using local LLM through LM Studio without blocking the event loop"""
+        try:
+            messages = self._build_messages(prompt, section_name)
+            params = self._completion_params(max_tokens)
+            cache_key = self._cache_key(messages, params)
+            if cache_key is not None and not bypass_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return self._format_latex_section(section_name, cached)
+
+            response = await self.policy.call_async(lambda: self._request_async(messages, params, section_name))
+
+            generated_text = response.choices[0].message.content
+            self.request_counter += 1
+            if cache_key is not None:
+                self.cache.put(cache_key, generated_text, params["model"])
+            return self._format_latex_section(section_name, generated_text)
+
+        except Exception as e:
+            print(f"Error generating section with local LLM: {str(e)}")
+            raise
+
+    async def complete_async(self, messages: List[Dict[str, str]], section_name: str,
+                             max_tokens: Optional[int] = None, bypass_cache: bool = False) -> str:
+        """One cached completion attempt without retries, for callers such as ModelRouter that handle failures"""
+        params = self._completion_params(max_tokens)
+        cache_key = self._cache_key(messages, params)
+        if cache_key is not None and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        response = await self._request_async(messages, params, section_name)
+        generated_text = response.choices[0].message.content
+        self.request_counter += 1
+        if cache_key is not None:
+            self.cache.put(cache_key, generated_text, params["model"])
+        return generated_text
+
+    async def stream_section(self, prompt: str, section_name: str, bypass_cache: bool = False,
+                             max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield raw generated text chunks as the local LLM produces them.
+
+        The caller is responsible for passing the joined text through _format_latex_section.
+        """
+        messages = self._build_messages(prompt, section_name)
+        params = self._completion_params(max_tokens)
+        cache_key = self._cache_key(messages, params)
+        if cache_key is not None and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        started_at = time.perf_counter()
+        try:
+            chunks = []
+            async with self.llm_slots:
+                started_at = time.perf_counter()
+                async for delta in self._stream_from_pool(messages, params):
+                    chunks.append(delta)
+                    yield delta
+
+            self.request_counter += 1
+            generated_text = "".join(chunks)
+            # Streamed responses carry no usage block, so token counts are estimated
+            record_llm_call(
+                "local",
+                time.perf_counter() - started_at,
+                sum(estimate_tokens(m["content"]) for m in messages),
+                estimate_tokens(generated_text),
+                section=section_name,
+                streamed=True
+            )
+            if cache_key is not None:
+                self.cache.put(cache_key, generated_text, params["model"])
+
+        except Exception as e:
+            record_llm_call("local", time.perf_counter() - started_at, status="error", section=section_name)
+            print(f"Error streaming section with local LLM: {str(e)}")
+            raise
+
+    async def _open_stream(self, messages: List[Dict[str, str]], params: Dict) -> Tuple[LLMBackend, object]:
+        """Open a completion stream on the least busy endpoint, failing over if one can't be reached"""
+        tried = set()
+        last_error = None
+        while True:
+            try:
+                backend = await self.pool.acquire_async(tried)
+            except NoBackendAvailableError as e:
+                raise e from last_error
+            try:
+                stream = await backend.async_client.chat.completions.create(
+                    messages=messages,
+                    stream=True,
+                    timeout=self.stream_policy.timeout,
+                    **params
+                )
+            except BaseException as e:
+                self.pool.release(backend, e if isinstance(e, Exception) else None, cancelled=not isinstance(e, Exception))
+                if not isinstance(e, Exception) or not is_connection_error(e):
+                    raise
+                last_error = e
+                tried.add(backend)
+                continue
+            return backend, stream
+
+    async def _stream_from_pool(self, messages: List[Dict[str, str]], params: Dict) -> AsyncIterator[str]:
+        """Stream a completion from the pool, giving up if no token arrives for stream_policy.timeout seconds"""
+        backend, stream = await self.stream_policy.call_async(lambda: self._open_stream(messages, params))
+
+        # Once tokens have been yielded the request can't be replayed elsewhere
+        error = None
+        cancelled = False
+        try:
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.stream_policy.timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No tokens from {backend.base_url} for {self.stream_policy.timeout} seconds")
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    yield delta
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else None
+            cancelled = error is None
+            if error is not None and is_retryable(error):
+                self.stream_policy.breaker.record_failure()
+            raise
+        finally:
+            self.pool.release(backend, error, cancelled=cancelled)
@@ -1,27 +1,187 @@
-import google.generativeai as genai
 from ..utils.pdf_handler import PDFBatchProcessor
-from ..utils.rate_limiter import rate_limit, RateLimiter
-from typing import Dict, List
+from ..utils.rate_limiter import get_rate_limiter
+from ..utils.response_cache import ResponseCache, get_response_cache
+from ..utils.token_utils import estimate_tokens, pack_by_budget
+from ..utils.metrics import record_llm_call
+from ..utils.concurrency import get_concurrency_limiter
+from ..utils.metrics import get_metrics
+from ..utils.dedup import Deduplicator
+from ..utils.retrieval_index import RetrievalIndex, build_query, get_embedding_fn
+from ..utils.resilience import ResiliencePolicy
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 from config.settings import (
     GEMINI_API_KEY, 
     GEMINI_MODEL,
     GEMINI_REQUESTS_PER_MINUTE,
-    RETRY_ATTEMPTS,
-    RETRY_DELAY
+    GEMINI_TOKENS_PER_MINUTE,
+    RESPONSE_CACHE_ENABLED,
+    SUMMARY_TOKEN_BUDGET,
+    SUMMARY_MAP_CONCURRENCY,
+    LLM_MAX_CONCURRENT_CALLS,
+    RETRIEVAL_ENABLED,
+    RETRIEVAL_TOP_K,
+    DEDUP_ENABLED,
+    GEMINI_TIMEOUT,
+    GEMINI_HEDGE_PERCENTILE,
+    ROUTER_ENABLED
 )
 import time
 
 class GeminiAgent:
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(GEMINI_MODEL)
-        self.pdf_processor = PDFBatchProcessor()
-        self.rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE)
+    def __init__(self,
+                 cache: Optional[ResponseCache] = None,
+                 use_cache: bool = RESPONSE_CACHE_ENABLED,
+                 token_budget: int = SUMMARY_TOKEN_BUDGET,
+                 map_concurrency: int = SUMMARY_MAP_CONCURRENCY,
+                 use_retrieval: bool = RETRIEVAL_ENABLED,
+                 retrieval_top_k: int = RETRIEVAL_TOP_K,
+                 deduplicator: Optional[Deduplicator] = None,
+                 use_dedup: bool = DEDUP_ENABLED,
+                 use_router: bool = ROUTER_ENABLED):
+        # The Gemini client and PDF processor are built on first use to keep startup cheap
+        self._model = None
+        self._pdf_processor = None
+        self._init_lock = threading.Lock()
+        self.rate_limiter = get_rate_limiter("gemini", GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
         self.requests_count = 0
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        # Shared with every other agent and job in the process
+        self.llm_slots = get_concurrency_limiter("llm", LLM_MAX_CONCURRENT_CALLS)
+        self.token_budget = token_budget
+        self.map_concurrency = map_concurrency
+        self.use_retrieval = use_retrieval
+        self.retrieval_top_k = retrieval_top_k
+        self.deduplicator = (deduplicator or Deduplicator()) if use_dedup else None
+        self.policy = ResiliencePolicy("gemini", timeout=GEMINI_TIMEOUT, hedge_percentile=GEMINI_HEDGE_PERCENTILE)
+        # Async summarization calls go through a ModelRouter, built on first use, when use_router is set
+        self.use_router = use_router
+        self._router = None
 
-    @rate_limit
-    def summarize_section(self, contents: List[str], section_name: str):
-        """ Summarize multiple versions of the same section from different papers"""
+    @property
+    def model(self):
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    self._model = genai.GenerativeModel(GEMINI_MODEL)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    @property
+    def router(self):
+        if self._router is None and self.use_router:
+            with self._init_lock:
+                if self._router is None:
+                    from .model_router import ModelRouter
+                    self._router = ModelRouter(gemini_agent=self)
+        return self._router
+
+    @router.setter
+    def router(self, router):
+        self._router = router
+
+    @property
+    def pdf_processor(self) -> PDFBatchProcessor:
+        if self._pdf_processor is None:
+            with self._init_lock:
+                if self._pdf_processor is None:
+                    self._pdf_processor = PDFBatchProcessor()
+        return self._pdf_processor
+
+    @pdf_processor.setter
+    def pdf_processor(self, pdf_processor: PDFBatchProcessor):
+        self._pdf_processor = pdf_processor
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        """Response cache key for a prompt, or None when caching is disabled"""
+        if self.cache is None:
+            return None
+        # Gemini runs with its default generation config, so there are no sampling params to key on
+        return self.cache.make_key(GEMINI_MODEL, "", prompt, {})
+
+    def _record_response(self, response, estimated_tokens: int, started_at: float, cache_key: Optional[str]) -> str:
+        """Account for a completed Gemini response and store it in the cache"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.rate_limiter.record_usage(estimated_tokens, usage.total_token_count)
+            record_llm_call("gemini", time.perf_counter() - started_at,
+                            usage.prompt_token_count, usage.candidates_token_count)
+        else:
+            record_llm_call("gemini", time.perf_counter() - started_at,
+                            estimated_tokens, estimate_tokens(response.text))
+        self.requests_count+=1
+        if cache_key is not None:
+            self.cache.put(cache_key, response.text, GEMINI_MODEL)
+        return response.text
+
+    def _request(self, prompt: str, cache_key: Optional[str]) -> str:
+        """One Gemini call attempt, within the shared rate limit and LLM slots"""
+        estimated_tokens = estimate_tokens(prompt)
+        self.rate_limiter.acquire(estimated_tokens)
+        with self.llm_slots:
+            started_at = time.perf_counter()
+            try:
+                response = self.model.generate_content(prompt, request_options={"timeout": self.policy.timeout})
+            except Exception:
+                record_llm_call("gemini", time.perf_counter() - started_at, status="error")
+                raise
+        return self._record_response(response, estimated_tokens, started_at, cache_key)
+
+    async def _request_async(self, prompt: str, cache_key: Optional[str]) -> str:
+        estimated_tokens = estimate_tokens(prompt)
+        await self.rate_limiter.acquire_async(estimated_tokens)
+        async with self.llm_slots:
+            started_at = time.perf_counter()
+            try:
+                response = await self.model.generate_content_async(prompt, request_options={"timeout": self.policy.timeout})
+            except BaseException:
+                # Cancelled hedges and timed-out attempts count as failed calls too
+                record_llm_call("gemini", time.perf_counter() - started_at, status="error")
+                raise
+        return self._record_response(response, estimated_tokens, started_at, cache_key)
+
+    def _generate(self, prompt: str, bypass_cache: bool = False) -> str:
+        """Send a prompt to Gemini, going through the response cache"""
+        cache_key = self._cache_key(prompt)
+        if cache_key is not None and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        return self.policy.call(lambda: self._request(prompt, cache_key))
+
+    async def _generate_async(self, prompt: str, bypass_cache: bool = False) -> str:
+        """Async _generate using generate_content_async, so summaries don't tie up threads.
+
+        With a router, the call may be served by a local backend instead while Gemini is throttled.
+        """
+        cache_key = self._cache_key(prompt)
+        if cache_key is not None and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if self.router is not None:
+            return await self.router.summarize_async(prompt, bypass_cache)
+        return await self.policy.call_async(lambda: self._request_async(prompt, cache_key))
+
+    async def attempt_async(self, prompt: str, bypass_cache: bool = False) -> str:
+        """One cached Gemini call without retries, for callers such as ModelRouter that handle failures"""
+        cache_key = self._cache_key(prompt)
+        if cache_key is not None and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        return await self._request_async(prompt, cache_key)
+
+    def _summary_prompt(self, contents: List[str], section_name: str) -> str:
         combined_content = "\n\n".join(contents)
         prompt = f"""
         Analyze and summarize the following {section_name} section from multiple research papers.
@@ -36,27 +196,199 @@ class GeminiAgent:
 
         Please provide a comprehensive summary that can serve as a foundation for a survey paper section.
         """
-        response = self.model.generate_content(prompt)
-        self.requests_count+=1
-        print(self.requests_count)
-        return response.text 
+        return prompt
+
+    def _merge_prompt(self, summaries: List[str], section_name: str) -> str:
+        combined_summaries = "\n\n---\n\n".join(summaries)
+        prompt = f"""
+        The following are partial summaries of the {section_name} section, each covering a different subset of research papers.
+        Merge them into a single coherent summary that:
+        1. Keeps the common themes and patterns across all subsets
+        2. Preserves key methodologies or findings
+        3. Keeps important contrasts or complementary information
+        4. Removes repetition between the partial summaries
+
+        Partial summaries:
+        {combined_summaries}
+
+        Please provide a comprehensive summary that can serve as a foundation for a survey paper section.
+        """
+        return prompt
+
+    def summarize_section(self, contents: List[str], section_name: str, bypass_cache: bool = False):
+        """ Summarize multiple versions of the same section from different papers"""
+        return self._generate(self._summary_prompt(contents, section_name), bypass_cache)
+
+    def merge_summaries(self, summaries: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        """Merge partial summaries of the same section into a single summary"""
+        return self._generate(self._merge_prompt(summaries, section_name), bypass_cache)
+
+    async def summarize_section_async(self, contents: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        return await self._generate_async(self._summary_prompt(contents, section_name), bypass_cache)
+
+    async def merge_summaries_async(self, summaries: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        return await self._generate_async(self._merge_prompt(summaries, section_name), bypass_cache)
+
+    def summarize_section_hierarchical(self, contents: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        """Map-reduce summarization that keeps every prompt within the token budget"""
+        if sum(estimate_tokens(content) for content in contents) <= self.token_budget:
+            return self.summarize_section(contents, section_name, bypass_cache)
+
+        # Map: summarize budget-sized chunks of the contents in parallel
+        chunks = pack_by_budget(contents, self.token_budget)
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.map_concurrency) as executor:
+            partials = list(executor.map(
+                lambda chunk: context.copy().run(self.summarize_section, chunk, section_name, bypass_cache),
+                chunks
+            ))
+
+        return self._reduce_summaries(partials, section_name, bypass_cache)
+
+    def _reduce_summaries(self, summaries: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        """Merge summaries, recursing while they don't fit in a single prompt"""
+        if len(summaries) == 1:
+            return summaries[0]
+        if sum(estimate_tokens(summary) for summary in summaries) <= self.token_budget:
+            return self.merge_summaries(summaries, section_name, bypass_cache)
+
+        groups = pack_by_budget(summaries, self.token_budget)
+        if len(groups) >= len(summaries):
+            # Summaries too large to group; merge pairwise so each level still shrinks
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.map_concurrency) as executor:
+            merged = list(executor.map(
+                lambda group: context.copy().run(self.merge_summaries, group, section_name, bypass_cache) if len(group) > 1 else group[0],
+                groups
+            ))
+
+        return self._reduce_summaries(merged, section_name, bypass_cache)
+
+    async def summarize_section_hierarchical_async(self, contents: List[str], section_name: str,
+                                                   bypass_cache: bool = False) -> str:
+        """Async summarize_section_hierarchical, with the map step as concurrent coroutines"""
+        if sum(estimate_tokens(content) for content in contents) <= self.token_budget:
+            return await self.summarize_section_async(contents, section_name, bypass_cache)
+
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize(chunk: List[str]) -> str:
+            async with semaphore:
+                return await self.summarize_section_async(chunk, section_name, bypass_cache)
+
+        partials = await asyncio.gather(*(summarize(chunk) for chunk in pack_by_budget(contents, self.token_budget)))
+        return await self._reduce_summaries_async(list(partials), section_name, bypass_cache)
+
+    async def _reduce_summaries_async(self, summaries: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        if len(summaries) == 1:
+            return summaries[0]
+        if sum(estimate_tokens(summary) for summary in summaries) <= self.token_budget:
+            return await self.merge_summaries_async(summaries, section_name, bypass_cache)
+
+        groups = pack_by_budget(summaries, self.token_budget)
+        if len(groups) >= len(summaries):
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def merge(group: List[str]) -> str:
+            if len(group) == 1:
+                return group[0]
+            async with semaphore:
+                return await self.merge_summaries_async(group, section_name, bypass_cache)
+
+        merged = await asyncio.gather(*(merge(group) for group in groups))
+        return await self._reduce_summaries_async(list(merged), section_name, bypass_cache)
+
+    async def combine_summaries_async(self, summaries: List[str], section_name: str, bypass_cache: bool = False) -> str:
+        """Merge any number of partial summaries into one, in as many rounds as the token budget needs"""
+        return await self._reduce_summaries_async(summaries, section_name, bypass_cache)
     
-    def process_pdf(self, pdf_files: List[str]) -> Dict[str, str]:
-        """Process multiple PDF files and generate summaries for each section"""
+    def extract_sections(self, pdf_files: List[str]) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+        """Extract and group the sections of every PDF, returning them with the error of each skipped file"""
         # Validate PDF count
         if not self.pdf_processor.validate_pdf_count(pdf_files):
-            raise ValueError("Number of PDF files must be between 1 and 10")
+            raise ValueError(f"Number of PDF files must be between 1 and {self.pdf_processor.max_files}")
         
         # Process all PDFs and organize sections
-        all_sections = self.pdf_processor.process_uploaded_files(pdf_files)
+        return self.pdf_processor.process_files(pdf_files)
 
-        
-        # Generate summaries for each section
-        section_summaries = {}
-        for section_name, contents in all_sections.items():
-            if contents: #Only process sections that have content
-                summary = self.summarize_section(contents, section_name)
-                section_summaries[section_name] = summary
+    def extract_paper_sections(self, pdf_files: List[str]) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+        """Extract the sections of each PDF separately, keyed by file path, along with the error of each skipped file"""
+        if len(pdf_files) > self.pdf_processor.max_files:
+            raise ValueError(f"Number of PDF files must be at most {self.pdf_processor.max_files}")
+
+        return self.pdf_processor.extract_files(pdf_files)
+
+    def deduplicate_sections(self, all_sections: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Collapse passages repeated across papers so they are only summarized once"""
+        if self.deduplicator is None:
+            return all_sections
+        deduplicated, stats = self.deduplicator.deduplicate(all_sections)
+        metrics = get_metrics()
+        metrics.inc("dedup_tokens_removed_total", stats["tokens_removed"])
+        metrics.event("dedup", **stats)
+        return deduplicated
+
+    def retrieve_passages(self,
+                          index: RetrievalIndex,
+                          contents: List[str],
+                          section_name: str,
+                          research_area: str = "") -> List[str]:
+        """Keep only the top-k passages of a section that are most relevant to it and the research area"""
+        content_tokens = sum(estimate_tokens(content) for content in contents)
+        if content_tokens <= self.retrieval_top_k * index.chunk_tokens:
+            return contents
+
+        # Cap each paper's share so one long paper can't crowd out the rest
+        max_per_source = max(1, math.ceil(2 * self.retrieval_top_k / len(contents)))
+        passages = index.search(build_query(section_name, research_area), self.retrieval_top_k,
+                                section=section_name, max_per_source=max_per_source)
+        # Present the passages in paper and reading order
+        passages.sort(key=lambda passage: (passage.source, passage.position))
+        retrieved = [passage.text for passage in passages]
+        get_metrics().event("retrieval", section=section_name, passages=len(retrieved),
+                            content_tokens=content_tokens,
+                            retrieved_tokens=sum(estimate_tokens(text) for text in retrieved))
+        return retrieved
+
+    def prepare_section_inputs(self,
+                               all_sections: Dict[str, List[str]],
+                               skip=(),
+                               research_area: str = "") -> Dict[str, List[str]]:
+        """Deduplicated, retrieval-trimmed contents of every section with content that isn't in `skip`"""
+        pending = {
+            section_name: contents
+            for section_name, contents in all_sections.items()
+            if contents and section_name not in skip  #Only process sections that have content
+        }
+        if pending:
+            pending = self.deduplicate_sections(pending)
+        if self.use_retrieval and pending:
+            index = RetrievalIndex.from_sections(pending, embed_fn=get_embedding_fn())
+            pending = {
+                section_name: self.retrieve_passages(index, contents, section_name, research_area)
+                for section_name, contents in pending.items()
+            }
+        return pending
+
+    def summarize_sections(self,
+                           all_sections: Dict[str, List[str]],
+                           existing: Optional[Dict[str, str]] = None,
+                           on_summary: Optional[Callable[[str, str], None]] = None,
+                           research_area: str = "") -> Dict[str, str]:
+        """Summarize every section with content, skipping those already in `existing`"""
+        section_summaries = dict(existing or {})
+        for section_name, contents in self.prepare_section_inputs(all_sections, section_summaries, research_area).items():
+            summary = self.summarize_section_hierarchical(contents, section_name)
+            section_summaries[section_name] = summary
+            if on_summary is not None:
+                on_summary(section_name, summary)
 
         return section_summaries
 
+    def process_pdf(self, pdf_files: List[str]) -> Dict[str, str]:
+        """Process multiple PDF files and generate summaries for each section"""
+        # Skipped files are already reported through the metrics by the batch processor
+        all_sections, _ = self.extract_sections(pdf_files)
+        return self.summarize_sections(all_sections)
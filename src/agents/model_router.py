@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..utils.metrics import get_metrics
+from ..utils.resilience import (
+    CircuitOpenError,
+    ResiliencePolicy,
+    cooldown_remaining,
+    get_circuit_breaker,
+    get_latency_tracker,
+    is_retryable
+)
+from ..utils.token_utils import estimate_tokens
+from .backend_pool import NoBackendAvailableError
+from .registry import get_agent
+from config.settings import (
+    ROUTER_TASK_BACKENDS,
+    ROUTER_PRIOR_LATENCY,
+    ROUTER_MIN_SAMPLES,
+    RETRY_ATTEMPTS,
+    LOCAL_LLM_MAX_PROMPT_TOKENS
+)
+
+SUMMARY_SYSTEM_PROMPT = "You are an expert research assistant who summarizes academic papers for survey authors."
+
+class RouteStats:
+    """Calls routed to a backend that haven't finished, shared by every router in the process"""
+    def __init__(self):
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.pending += 1
+
+    def exit(self):
+        with self._lock:
+            self.pending -= 1
+
+_route_stats: Dict[str, RouteStats] = {}
+_route_stats_lock = threading.Lock()
+
+def get_route_stats(backend: str) -> RouteStats:
+    with _route_stats_lock:
+        if backend not in _route_stats:
+            _route_stats[backend] = RouteStats()
+        return _route_stats[backend]
+
+class ModelRouter:
+    """Sends each summarization or generation call to the acceptable backend expected to finish it first.
+
+    The estimate for a backend is how long the call would wait plus its median
+    latency for that task. For Gemini, the wait is the time left on its rate limit
+    or on a cooldown after a 429. For the local servers, it is the calls queued
+    beyond their free slots. ROUTER_TASK_BACKENDS says which backends may serve
+    each task. A call that fails with a retryable error is routed again, so a
+    saturated provider sheds load to the others instead of stalling in retry sleeps.
+    Each attempt keeps the timeout and hedging of the serving agent's own policy.
+    """
+    def __init__(self,
+                 gemini_agent=None,
+                 local_agent=None,
+                 task_backends: Optional[Dict[str, List[str]]] = None,
+                 prior_latency: Optional[Dict[str, float]] = None,
+                 max_attempts: int = RETRY_ATTEMPTS):
+        # Agents default to the shared ones from the registry, looked up on first use
+        self._gemini_agent = gemini_agent
+        self._local_agent = local_agent
+        self.task_backends = task_backends or ROUTER_TASK_BACKENDS
+        self.prior_latency = prior_latency or ROUTER_PRIOR_LATENCY
+        self.max_attempts = max_attempts
+        self.policies: Dict[str, ResiliencePolicy] = {}
+
+    @property
+    def gemini_agent(self):
+        if self._gemini_agent is None:
+            self._gemini_agent = get_agent("gemini")
+        return self._gemini_agent
+
+    @property
+    def local_agent(self):
+        if self._local_agent is None:
+            self._local_agent = get_agent("async_deepseek")
+        return self._local_agent
+
+    def policy(self, backend: str) -> ResiliencePolicy:
+        """Single-attempt version of the backend agent's policy: the router retries by routing again"""
+        if backend not in self.policies:
+            agent_policy = (self.gemini_agent if backend == "gemini" else self.local_agent).policy
+            self.policies[backend] = ResiliencePolicy(
+                backend,
+                timeout=agent_policy.timeout,
+                max_attempts=1,
+                hedge_percentile=agent_policy.hedge_percentile
+            )
+        return self.policies[backend]
+
+    def latency(self, backend: str, task: str) -> float:
+        """Median latency of recent calls of this task on the backend, or its prior"""
+        observed = get_latency_tracker(f"router:{backend}:{task}").percentile(50, ROUTER_MIN_SAMPLES)
+        return observed if observed is not None else self.prior_latency.get(backend, 60.0)
+
+    def estimate(self, backend: str, task: str, prompt_tokens: int) -> Optional[float]:
+        """Seconds until a call would finish on the backend, or None if it can't take the call now"""
+        if get_circuit_breaker(backend).is_open():
+            return None
+        latency = self.latency(backend, task)
+        pending = get_route_stats(backend).pending
+        if backend == "gemini":
+            # Routed calls still in flight are counted as queued, which errs on the side of offloading
+            wait = self.gemini_agent.rate_limiter.estimate_wait(prompt_tokens, queued=pending)
+        else:
+            if LOCAL_LLM_MAX_PROMPT_TOKENS and prompt_tokens > LOCAL_LLM_MAX_PROMPT_TOKENS:
+                return None
+            pool = self.local_agent.pool
+            slots = pool.capacity()
+            if not slots:
+                return None
+            queued = max(pending, pool.outstanding())
+            wait = max(0, queued - slots + 1) * latency / slots
+        return max(wait, cooldown_remaining(backend)) + latency
+
+    def choose(self, task: str, prompt_tokens: int, backends: List[str]) -> Optional[str]:
+        """Backend expected to finish first; ties go to the one listed first in the task's policy"""
+        estimates = {}
+        for backend in self.task_backends.get(task, []):
+            if backend in backends:
+                estimate = self.estimate(backend, task, prompt_tokens)
+                if estimate is not None:
+                    estimates[backend] = estimate
+        if not estimates:
+            return None
+        return min(estimates, key=estimates.get)
+
+    async def _dispatch(self, task: str, prompt_tokens: int, calls: Dict[str, Callable[[], Awaitable[str]]]) -> str:
+        metrics = get_metrics()
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            backend = self.choose(task, prompt_tokens, list(calls))
+            if backend is None:
+                raise NoBackendAvailableError(f"No backend can take {task} calls right now") from last_error
+            if attempt:
+                metrics.inc("router_reroutes_total", task=task, backend=backend)
+            metrics.inc("router_calls_total", task=task, backend=backend)
+
+            # Only worth waiting out when it is still the best option
+            cooldown = cooldown_remaining(backend)
+            if cooldown > 0:
+                await asyncio.sleep(cooldown)
+
+            stats = get_route_stats(backend)
+            stats.enter()
+            started_at = time.perf_counter()
+            try:
+                result = await self.policy(backend).call_async(calls[backend])
+            except Exception as e:
+                if not (is_retryable(e) or isinstance(e, (CircuitOpenError, NoBackendAvailableError))):
+                    raise
+                last_error = e
+                print(f"{task} call on {backend} failed ({str(e)}), routing again...")
+                continue
+            finally:
+                stats.exit()
+            get_latency_tracker(f"router:{backend}:{task}").record(time.perf_counter() - started_at)
+            return result
+        raise last_error
+
+    async def summarize_async(self, prompt: str, bypass_cache: bool = False) -> str:
+        """Run a summarization prompt on Gemini or a local server"""
+        messages = [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        return await self._dispatch("summarize", estimate_tokens(prompt), {
+            "gemini": lambda: self.gemini_agent.attempt_async(prompt, bypass_cache),
+            "local": lambda: self.local_agent.complete_async(messages, "summary", bypass_cache=bypass_cache)
+        })
+
+    async def generate_section_async(self, prompt: str, section_name: str, max_tokens: Optional[int] = None,
+                                     bypass_cache: bool = False) -> str:
+        """Generate a LaTeX section on a local server or, if the policy allows, on Gemini"""
+        messages = self.local_agent._build_messages(prompt, section_name)
+        generated_text = await self._dispatch("generate", sum(estimate_tokens(m["content"]) for m in messages), {
+            "local": lambda: self.local_agent.complete_async(messages, section_name, max_tokens, bypass_cache),
+            "gemini": lambda: self.gemini_agent.attempt_async(
+                "\n\n".join(message["content"] for message in messages), bypass_cache
+            )
+        })
+        return self.local_agent._format_latex_section(section_name, generated_text)
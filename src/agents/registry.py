@@ -0,0 +1,37 @@
+import threading
+from typing import Callable, Dict
+
+_factories: Dict[str, Callable] = {}
+_instances: Dict = {}
+_lock = threading.Lock()
+
+def register_agent(name: str, factory: Callable):
+    """Register how to build a shared agent; replaces any existing instance"""
+    with _lock:
+        _factories[name] = factory
+        _instances.pop(name, None)
+
+def get_agent(name: str):
+    """Return the process-wide agent for name, building it on first use"""
+    with _lock:
+        if name not in _instances:
+            if name not in _factories:
+                raise KeyError(f"No agent registered under '{name}'")
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+def _gemini_agent():
+    from .gemini_agent import GeminiAgent
+    return GeminiAgent()
+
+def _deepseek_agent():
+    from .deepseek_agent import DeepSeekAgent
+    return DeepSeekAgent()
+
+def _async_deepseek_agent():
+    from .deepseek_agent import AsyncDeepSeekAgent
+    return AsyncDeepSeekAgent()
+
+register_agent("gemini", _gemini_agent)
+register_agent("deepseek", _deepseek_agent)
+register_agent("async_deepseek", _async_deepseek_agent)
@@ -0,0 +1,161 @@
+"""Headless batch generation of many surveys from a manifest.
+
+The manifest is a JSON file with a list of surveys (relative PDF paths are resolved
+against the manifest's directory):
+
+    {"surveys": [
+        {"research_area": "Texture Classification", "pdf_files": ["papers/a.pdf", "papers/b.pdf"]},
+        ...
+    ]}
+
+Usage:
+    python -m src.batch_cli manifest.json --jobs 4 --llm-concurrency 8
+
+With --incremental, each research area's living survey is updated in place: only
+papers added since the previous run are processed, and papers no longer listed
+are removed from the survey.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+from config.settings import (
+    OUTPUT_DIR,
+    MAX_PDF_FILES,
+    PDF_EXTRACTION_WORKERS,
+    LLM_MAX_CONCURRENT_CALLS
+)
+
+def load_manifest(path: str) -> List[Dict]:
+    """Read a manifest and return its surveys with absolute PDF paths"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    surveys = data["surveys"] if isinstance(data, dict) else data
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    entries = []
+    for index, survey in enumerate(surveys):
+        if not survey.get("research_area") or not survey.get("pdf_files"):
+            raise ValueError(f"Manifest entry {index} needs 'research_area' and 'pdf_files'")
+        entries.append({
+            "research_area": survey["research_area"],
+            "pdf_files": [os.path.join(base_dir, pdf_path) for pdf_path in survey["pdf_files"]]
+        })
+    return entries
+
+def pre_extract(entries: List[Dict], workers: int) -> Dict[str, str]:
+    """Parse every distinct PDF once in a single process pool, filling the extraction cache"""
+    from .utils.pdf_handler import PDFBatchProcessor
+
+    unique_files = list(dict.fromkeys(path for entry in entries for path in entry["pdf_files"]))
+    processor = PDFBatchProcessor(max_files=len(unique_files), max_workers=workers)
+    _, errors = processor.process_files(unique_files)
+    print(f"Extracted {len(unique_files) - len(errors)}/{len(unique_files)} PDFs "
+          f"(cache hits: {processor.cache.hits})")
+    return errors
+
+def skipped_pdfs(entry: Dict, incremental: bool = False) -> Dict[str, str]:
+    """File path -> error of each PDF the survey's last run had to leave out"""
+    from .models.living_survey import LivingSurvey
+    from .models.survey_job import SurveyJob
+
+    if incremental:
+        return LivingSurvey.open(entry["research_area"]).skipped_pdfs()
+    try:
+        job = SurveyJob.find(entry["research_area"], entry["pdf_files"])
+    except OSError:
+        # An unreadable PDF has no content hash, so no job was created for it
+        return {}
+    return job.skipped_pdfs() if job is not None else {}
+
+async def run_batch(entries: List[Dict], max_jobs: int, incremental: bool = False, fresh: bool = False) -> List[Dict]:
+    """Generate (or, when incremental, update) every survey, at most max_jobs at a time.
+
+    Unless fresh is set, unfinished jobs from an earlier run are resumed from their checkpoints.
+    """
+    from .models.survey_model import SurveyGenerator
+
+    semaphore = asyncio.Semaphore(max_jobs)
+
+    async def run(entry: Dict) -> Dict:
+        async with semaphore:
+            started_at = time.perf_counter()
+            result = {"research_area": entry["research_area"], "pdf_files": entry["pdf_files"]}
+            try:
+                generator = SurveyGenerator()
+                if incremental:
+                    result["output"] = await generator.update_survey(entry["pdf_files"], entry["research_area"])
+                else:
+                    result["output"] = await generator.generate_survey(entry["pdf_files"], entry["research_area"],
+                                                                       fresh=fresh)
+                result["status"] = "ok"
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+            result["skipped_pdfs"] = skipped_pdfs(entry, incremental)
+            result["duration_s"] = round(time.perf_counter() - started_at, 3)
+            print(f"[{result['status']}] {entry['research_area']} ({result['duration_s']}s)")
+            return result
+
+    return await asyncio.gather(*(run(entry) for entry in entries))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSON manifest of surveys to generate")
+    parser.add_argument("--jobs", type=int, default=4, help="surveys generated concurrently")
+    parser.add_argument("--workers", type=int, default=PDF_EXTRACTION_WORKERS, help="PDF extraction processes")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_MAX_CONCURRENT_CALLS,
+                        help="in-flight LLM calls shared by all surveys")
+    parser.add_argument("--max-pdfs", type=int, default=None,
+                        help=f"max PDFs per survey (default: largest in the manifest, at least {MAX_PDF_FILES})")
+    parser.add_argument("--report", default=None, help="path of the JSON summary report")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update each research area's living survey instead of generating it from scratch")
+    parser.add_argument("--fresh", action="store_true",
+                        help="discard the checkpoints of unfinished jobs instead of resuming them")
+    args = parser.parse_args(argv)
+
+    from .utils.concurrency import get_concurrency_limiter
+    from .agents.registry import get_agent
+    from .utils.metrics import get_metrics
+
+    entries = load_manifest(args.manifest)
+
+    # Must run before any agent is built so every job shares this budget
+    get_concurrency_limiter("llm", args.llm_concurrency)
+    max_pdfs = args.max_pdfs or max([MAX_PDF_FILES] + [len(entry["pdf_files"]) for entry in entries])
+    get_agent("gemini").pdf_processor.max_files = max_pdfs
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    started_at = time.perf_counter()
+    extraction_errors = pre_extract(entries, args.workers)
+    results = asyncio.run(run_batch(entries, args.jobs, args.incremental, args.fresh))
+    elapsed = time.perf_counter() - started_at
+
+    report = {
+        "manifest": os.path.abspath(args.manifest),
+        "finished_at": datetime.now().isoformat(),
+        "duration_s": round(elapsed, 3),
+        "surveys": len(results),
+        "succeeded": sum(1 for result in results if result["status"] == "ok"),
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+        "extraction_errors": extraction_errors,
+        "results": results
+    }
+    report_path = args.report or os.path.join(
+        OUTPUT_DIR, f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+
+    get_metrics().event("batch_finished", manifest=report["manifest"], surveys=report["surveys"],
+                        succeeded=report["succeeded"], duration_s=report["duration_s"])
+    print(f"{report['succeeded']}/{report['surveys']} surveys generated in {elapsed:.1f}s")
+    print(f"Report saved to: {report_path}")
+    return 0 if report["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,42 +1,51 @@
-import gradio as gr
 import asyncio
-from src.models.survey_model import SurveyGenerator, SurveyProgress
+import os
+from src.models.job_scheduler import JobScheduler, QueueFullError
+from src.utils.metrics import get_metrics
+from config.settings import MAX_PDF_FILES, METRICS_PORT
 
 class GradioInterface:
-    def __init__(self):
-        self.survey_generator = SurveyGenerator()
-        self.progress = SurveyProgress()
+    def __init__(self, poll_interval: float = 0.5):
+        # One scheduler for every browser session; each submission gets its own job and progress
+        self.scheduler = JobScheduler()
+        self.poll_interval = poll_interval
 
     async def generate_survey_with_progress(self, pdf_files, research_area):
         try:
-            # Update progress
-            self.progress.update("Processing PDF files...")
-            yield self.progress.status_message, self.progress.progress_percentage, None
+            job_id = self.scheduler.submit(pdf_files, research_area)
+        except QueueFullError as e:
+            yield f"Error: {str(e)}", 0, "", None
+            return
 
-            # Generate survey
-            filepath = await self.survey_generator.generate_survey(pdf_files, research_area)
-
-            # # Validate survey length
-            # if not await self.survey_generator.validate_survey_length(filepath):
-            #     raise ValueError("Generated survey does not meet length requirements")
-            
-            self.progress.update("Survey generation complete!")
-            yield self.progress.status_message, self.progress.progress_percentage, filepath
+        while True:
+            status = self.scheduler.get_status(job_id)
+            if status["status"] == "queued":
+                message = f"Queued (position {status['queue_position']})..."
+            elif status["status"] == "failed":
+                message = f"Error: {status['error']}\nPlease try again in a few minutes or with fewer files"
+            else:
+                message = status["message"]
+            if status["skipped_pdfs"]:
+                message += "\nSkipped PDFs:\n" + "\n".join(
+                    f"- {os.path.basename(path)}: {error}" for path, error in status["skipped_pdfs"].items()
+                )
 
-        
-        except Exception as e:
-            error_message = f"Error: {str(e)}\nPlease try again in a few minutes or with fewer files"
-            self.progress.update(error_message)
-            yield self.progress.status_message, self.progress.progress_percentage, None
+            if status["status"] in ("done", "failed"):
+                yield message, status["progress"], "", status["output"]
+                return
+            yield message, status["progress"], status["preview"], None
+            await asyncio.sleep(self.poll_interval)
 
     def create_interface(self):
+        import gradio as gr  # imported here so the module loads without pulling in gradio
+
         with gr.Blocks() as interface:
             gr.Markdown("# Research Survey Generatos")
 
             with gr.Row():
                 pdf_files = gr.File(
                     file_count="multiple",
-                    label="Upload PDF Files (max 10 papers)"
+                    label=f"Upload PDF Files (max {MAX_PDF_FILES} papers)"
                 )
                 research_area = gr.Textbox(
                     label="Research Area",
@@ -53,16 +62,20 @@ class GradioInterface:
                 )
 
             generate_btn = gr.Button("Generate Survey")
+            preview = gr.Textbox(label="Current Section", lines=20)
             output = gr.File(label="Generated Survey (TEX)")
 
             generate_btn.click(
-                fn=self.survey_generator.generate_survey,
+                fn=self.generate_survey_with_progress,
                 inputs=[pdf_files, research_area],
-                outputs=output
+                outputs=[status, progress, preview, output]
             )
 
         return interface
     
     def launch(self):
+        if METRICS_PORT:
+            get_metrics().start_http_server(METRICS_PORT)
         interface = self.create_interface()
-        interface.launch()
\ No newline at end of file
+        interface.queue(default_concurrency_limit=None)
+        interface.launch()
@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+from .survey_model import SurveyGenerator, SurveyProgress
+from .survey_job import SurveyJob
+from ..utils.metrics import get_metrics
+from config.settings import SCHEDULER_WORKERS, SCHEDULER_MAX_QUEUE, SCHEDULER_HISTORY_SIZE
+
+class QueueFullError(Exception):
+    """Raised when a survey is submitted while the scheduler queue is full"""
+
+class ScheduledJob:
+    """State of one submitted survey, owned by the scheduler and read by pollers"""
+    def __init__(self, job_id: str, pdf_files: List[str], research_area: str, total_steps: int,
+                 survey_key: Optional[str] = None):
+        self.job_id = job_id
+        # SurveyJob ID of the inputs; identical submissions share one ScheduledJob while it is unfinished
+        self.survey_key = survey_key
+        self.pdf_files = pdf_files
+        self.research_area = research_area
+        self.status = "queued"
+        self.progress = SurveyProgress(total_steps)
+        self.preview = ""
+        self.output: Optional[str] = None
+        self.error: Optional[str] = None
+        # File path -> error of each PDF that couldn't be extracted and was left out of the survey
+        self.skipped_pdfs: Dict[str, str] = {}
+        self.submitted_at = datetime.now()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+class JobScheduler:
+    """Bounded queue of survey jobs processed by a fixed pool of workers.
+
+    Workers run on a private event loop in a background thread. Each worker owns its
+    own SurveyGenerator, while the agents' shared concurrency limiter caps LLM calls
+    across all jobs. A submission identical to a queued or running one (same research
+    area and PDF contents) is attached to that job instead of generating the same
+    survey twice into the same checkpoint directory.
+    """
+    def __init__(self,
+                 num_workers: int = SCHEDULER_WORKERS,
+                 max_queue_size: int = SCHEDULER_MAX_QUEUE,
+                 history_size: int = SCHEDULER_HISTORY_SIZE):
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, ScheduledJob]" = OrderedDict()
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._started = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker loop; called automatically by the first submit"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run_loop, name="survey-scheduler", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        for worker_index in range(self.num_workers):
+            self._loop.create_task(self._worker(worker_index))
+        self._started.set()
+        self._loop.run_forever()
+
+    def submit(self, pdf_files: List[str], research_area: str) -> str:
+        """Queue a survey and return its job ID; raises QueueFullError when the queue is full.
+
+        Returns the ID of the matching job when an identical survey is already queued or running.
+        """
+        self.start()
+        try:
+            survey_key = SurveyJob.make_job_id(research_area, pdf_files)
+        except OSError:
+            survey_key = None  # unreadable files; let the job itself report the error
+        with self._lock:
+            if survey_key is not None:
+                for existing in self._jobs.values():
+                    if existing.survey_key == survey_key and not existing.finished:
+                        get_metrics().inc("scheduler_coalesced_total")
+                        return existing.job_id
+            if len(self._pending) >= self.max_queue_size:
+                get_metrics().inc("scheduler_rejected_total")
+                raise QueueFullError(f"Too many surveys queued ({self.max_queue_size}), please try again later")
+            job = ScheduledJob(uuid.uuid4().hex[:12], list(pdf_files), research_area, len(SurveyGenerator.SECTION_ORDER) + 2,
+                               survey_key)
+            self._jobs[job.job_id] = job
+            self._pending.append(job.job_id)
+            self._trim_history()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job.job_id)
+        get_metrics().event("job_queued", scheduled_job_id=job.job_id, research_area=research_area)
+        return job.job_id
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    async def _worker(self, worker_index: int):
+        generator = None
+        while True:
+            job_id = await self._queue.get()
+            with self._lock:
+                self._pending.remove(job_id)
+                job = self._jobs[job_id]
+                job.status = "running"
+            if generator is None:
+                generator = SurveyGenerator()
+            await self._run_job(generator, job)
+
+    async def _run_job(self, generator: SurveyGenerator, job: ScheduledJob):
+        job.progress.update("Processing PDF files...")
+        try:
+            current_section = None
+            async for section_name, partial_text, filepath in generator.generate_survey_stream(job.pdf_files, job.research_area):
+                if filepath is not None:
+                    job.output = filepath
+                    continue
+                if section_name != current_section:
+                    if current_section is None:
+                        self._load_skipped_pdfs(job)  # extraction has finished by the first section
+                    current_section = section_name
+                    job.progress.update(f"Generating {section_name} section...")
+                job.preview = partial_text
+            self._load_skipped_pdfs(job)
+            job.progress.update("Survey generation complete!")
+            job.status = "done"
+        except Exception as e:
+            self._load_skipped_pdfs(job)
+            job.error = str(e)
+            job.progress.update(f"Error: {str(e)}")
+            job.status = "failed"
+
+    def _load_skipped_pdfs(self, job: ScheduledJob):
+        survey_job = SurveyJob.find(job.research_area, job.pdf_files, job.survey_key) if job.survey_key else None
+        if survey_job is not None:
+            job.skipped_pdfs = survey_job.skipped_pdfs()
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job's state for polling clients, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            queue_position = self._pending.index(job_id) + 1 if job_id in self._pending else 0
+            return {
+                "job_id": job.job_id,
+                "research_area": job.research_area,
+                "status": job.status,
+                "queue_position": queue_position,
+                "message": job.progress.status_message,
+                "progress": 100.0 if job.status == "done" else job.progress.progress_percentage,
+                "preview": job.preview,
+                "output": job.output,
+                "error": job.error,
+                "skipped_pdfs": dict(job.skipped_pdfs),
+                "submitted_at": job.submitted_at.isoformat()
+            }
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [status for status in (self.get_status(job_id) for job_id in job_ids) if status is not None]
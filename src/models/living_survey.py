@@ -0,0 +1,130 @@
+import hashlib
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from .survey_job import SurveyJob
+from config.settings import LIVING_SURVEYS_DIR
+
+class LivingSurvey(SurveyJob):
+    """Persistent state of a survey that is kept current as papers are added and removed.
+
+    Unlike a SurveyJob, the ID depends only on the research area, so every update
+    lands in the same directory. Papers are identified by their content hash. Layout:
+
+        <LIVING_SURVEYS_DIR>/<survey_id>/job.json                       metadata, status and current papers
+        <LIVING_SURVEYS_DIR>/<survey_id>/papers/<hash>.json             sections extracted from one paper
+        <LIVING_SURVEYS_DIR>/<survey_id>/partials/<section>/<id>.json   summary of one batch of papers' section
+        <LIVING_SURVEYS_DIR>/<survey_id>/summaries/<section>.json       merged summary and the papers it covers
+        <LIVING_SURVEYS_DIR>/<survey_id>/latex/<section>.tex            generated LaTeX section
+        <LIVING_SURVEYS_DIR>/<survey_id>/latex/<section>.json           source tokens per paper it was generated from
+    """
+    def __init__(self, survey_id: str, research_area: str, pdf_files: Iterable[str] = (),
+                 surveys_dir: str = LIVING_SURVEYS_DIR):
+        super().__init__(survey_id, research_area, list(pdf_files), surveys_dir)
+        os.makedirs(self._path("papers"), exist_ok=True)
+        os.makedirs(self._path("partials"), exist_ok=True)
+
+    @staticmethod
+    def make_survey_id(research_area: str) -> str:
+        return hashlib.sha256(research_area.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def open(cls, research_area: str, survey_id: Optional[str] = None,
+             surveys_dir: str = LIVING_SURVEYS_DIR) -> "LivingSurvey":
+        """Open the living survey for a research area, creating it if it doesn't exist yet"""
+        survey = cls(survey_id or cls.make_survey_id(research_area), research_area, surveys_dir=surveys_dir)
+        metadata = survey.metadata()
+        if metadata is None:
+            survey._write_json("job.json", {
+                "job_id": survey.job_id,
+                "research_area": research_area,
+                "papers": {},
+                "pdf_files": [],
+                "created_at": datetime.now().isoformat(),
+                "status": "created"
+            })
+        else:
+            survey.pdf_files = list(metadata.get("papers", {}).values())
+        return survey
+
+    def papers(self) -> Dict[str, str]:
+        """Content hash -> file path of the papers the survey currently covers"""
+        return dict((self.metadata() or {}).get("papers", {}))
+
+    def load_paper(self, content_hash: str) -> Optional[Dict[str, str]]:
+        return self._read_json(os.path.join("papers", f"{content_hash}.json"))
+
+    def save_paper(self, content_hash: str, sections: Dict[str, str]):
+        self._write_json(os.path.join("papers", f"{content_hash}.json"), sections)
+
+    def remove_paper(self, content_hash: str):
+        self._remove(os.path.join("papers", f"{content_hash}.json"))
+
+    @staticmethod
+    def make_partial_id(papers: Iterable[str]) -> str:
+        digest = hashlib.sha256()
+        for content_hash in sorted(papers):
+            digest.update(content_hash.encode("ascii"))
+        return digest.hexdigest()[:16]
+
+    def load_partials(self, section_name: str) -> List[Dict]:
+        """Partial summaries of a section, each with the ID and papers of its batch"""
+        directory = self._path("partials", section_name)
+        if not os.path.isdir(directory):
+            return []
+        partials = []
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".json"):
+                data = self._read_json(os.path.join("partials", section_name, filename))
+                if data is not None:
+                    partials.append(data)
+        # Oldest batch first, so merges see the papers in the order they were added
+        return sorted(partials, key=lambda partial: partial["timestamp"])
+
+    def save_partial(self, section_name: str, papers: List[str], summary: str) -> str:
+        partial_id = self.make_partial_id(papers)
+        os.makedirs(self._path("partials", section_name), exist_ok=True)
+        self._write_json(os.path.join("partials", section_name, f"{partial_id}.json"), {
+            "id": partial_id,
+            "section": section_name,
+            "papers": sorted(papers),
+            "timestamp": datetime.now().isoformat(),
+            "summary": summary
+        })
+        return partial_id
+
+    def remove_partial(self, section_name: str, partial_id: str):
+        self._remove(os.path.join("partials", section_name, f"{partial_id}.json"))
+
+    def load_summary_record(self, section_name: str) -> Optional[Dict]:
+        return self._read_json(os.path.join("summaries", f"{section_name}.json"))
+
+    def save_summary(self, section_name: str, summary: str, papers: Iterable[str] = ()):
+        self._write_json(os.path.join("summaries", f"{section_name}.json"), {
+            "section": section_name,
+            "research_area": self.research_area,
+            "timestamp": datetime.now().isoformat(),
+            "papers": sorted(papers),
+            "summary": summary
+        })
+
+    def load_section_sources(self, section_name: str) -> Dict[str, int]:
+        """Source tokens per paper of the content a section's LaTeX was generated from"""
+        return self._read_json(os.path.join("latex", f"{section_name}.json")) or {}
+
+    def save_section(self, section_name: str, latex_content: str, sources: Optional[Dict[str, int]] = None):
+        super().save_section(section_name, latex_content)
+        self._write_json(os.path.join("latex", f"{section_name}.json"), sources or {})
+
+    def remove_section(self, section_name: str, keep_summary: bool = False):
+        """Drop a section's LaTeX, and its summary unless keep_summary is set"""
+        self._remove(os.path.join("latex", f"{section_name}.tex"))
+        self._remove(os.path.join("latex", f"{section_name}.json"))
+        if not keep_summary:
+            self._remove(os.path.join("summaries", f"{section_name}.json"))
+
+    def _remove(self, relative_path: str):
+        try:
+            os.remove(self._path(relative_path))
+        except FileNotFoundError:
+            pass
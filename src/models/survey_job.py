@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+from ..utils.extraction_cache import file_content_hash
+from config.settings import JOBS_DIR
+
+class SurveyJob:
+    """Checkpoint store for one survey run, so an interrupted run can be resumed.
+
+    The job ID is derived from the research area and the PDFs' content hashes, so
+    re-submitting the same inputs picks up an unfinished run's checkpoints; a
+    complete job starts over. Layout:
+
+        <JOBS_DIR>/<job_id>/job.json           metadata and status
+        <JOBS_DIR>/<job_id>/extraction.json    sections extracted from all PDFs
+        <JOBS_DIR>/<job_id>/summaries/*.json   one Gemini summary per section
+        <JOBS_DIR>/<job_id>/latex/*.tex        one generated LaTeX section per section
+    """
+    def __init__(self, job_id: str, research_area: str, pdf_files: List[str], jobs_dir: str = JOBS_DIR):
+        self.job_id = job_id
+        self.research_area = research_area
+        self.pdf_files = list(pdf_files)
+        self.job_dir = os.path.join(jobs_dir, job_id)
+        os.makedirs(os.path.join(self.job_dir, "summaries"), exist_ok=True)
+        os.makedirs(os.path.join(self.job_dir, "latex"), exist_ok=True)
+
+    @staticmethod
+    def make_job_id(research_area: str, pdf_files: List[str]) -> str:
+        digest = hashlib.sha256(research_area.strip().lower().encode("utf-8"))
+        for content_hash in sorted(file_content_hash(path) for path in pdf_files):
+            digest.update(content_hash.encode("ascii"))
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def open(cls, research_area: str, pdf_files: List[str], job_id: Optional[str] = None,
+             jobs_dir: str = JOBS_DIR, fresh: bool = False) -> "SurveyJob":
+        """Open the job for these inputs, creating it if it doesn't exist yet.
+
+        A job that hasn't completed is resumed from its checkpoints. A complete job, or
+        any job when fresh is set, has its checkpoints cleared and runs from scratch.
+        """
+        job = cls(job_id or cls.make_job_id(research_area, pdf_files), research_area, pdf_files, jobs_dir)
+        metadata = job.metadata()
+        if metadata is not None and (fresh or metadata.get("status") == "complete"):
+            job.clear()
+            metadata = None
+        if metadata is None:
+            job._write_json("job.json", {
+                "job_id": job.job_id,
+                "research_area": research_area,
+                "pdf_files": job.pdf_files,
+                "created_at": datetime.now().isoformat(),
+                "status": "created"
+            })
+        return job
+
+    @classmethod
+    def find(cls, research_area: str, pdf_files: List[str], job_id: Optional[str] = None,
+             jobs_dir: str = JOBS_DIR) -> Optional["SurveyJob"]:
+        """The existing job for these inputs, or None; unlike open, never creates or clears one"""
+        job_id = job_id or cls.make_job_id(research_area, pdf_files)
+        if not os.path.exists(os.path.join(jobs_dir, job_id, "job.json")):
+            return None
+        return cls(job_id, research_area, pdf_files, jobs_dir)
+
+    def clear(self):
+        """Drop every checkpoint so the next run starts from scratch"""
+        for directory, extension in (("summaries", ".json"), ("latex", ".tex")):
+            for filename in os.listdir(self._path(directory)):
+                if filename.endswith(extension):
+                    os.remove(self._path(directory, filename))
+        for filename in ("extraction.json", "job.json"):
+            try:
+                os.remove(self._path(filename))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.job_dir, *parts)
+
+    def _write_text(self, relative_path: str, text: str):
+        # Write to a uniquely named temp file and rename, so an interrupted run never leaves a
+        # torn checkpoint and concurrent writers never share a temp file
+        path = self._path(relative_path)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path),
+                                         suffix=".tmp", delete=False) as f:
+            f.write(text)
+        os.replace(f.name, path)
+
+    def _write_json(self, relative_path: str, data):
+        self._write_text(relative_path, json.dumps(data, indent=4, ensure_ascii=False))
+
+    def _read_json(self, relative_path: str):
+        try:
+            with open(self._path(relative_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def metadata(self) -> Optional[Dict]:
+        return self._read_json("job.json")
+
+    def set_status(self, status: str, **fields):
+        metadata = self.metadata() or {"job_id": self.job_id}
+        metadata.update(status=status, updated_at=datetime.now().isoformat(), **fields)
+        self._write_json("job.json", metadata)
+
+    def skipped_pdfs(self) -> Dict[str, str]:
+        """File path -> error of each PDF the last extraction had to skip"""
+        return dict((self.metadata() or {}).get("skipped_pdfs", {}))
+
+    def load_extraction(self) -> Optional[Dict[str, List[str]]]:
+        return self._read_json("extraction.json")
+
+    def save_extraction(self, all_sections: Dict[str, List[str]]):
+        self._write_json("extraction.json", all_sections)
+
+    def load_summaries(self) -> Dict[str, str]:
+        summaries = {}
+        for filename in os.listdir(self._path("summaries")):
+            if filename.endswith(".json"):
+                data = self._read_json(os.path.join("summaries", filename))
+                if data is not None:
+                    summaries[data["section"]] = data["summary"]
+        return summaries
+
+    def save_summary(self, section_name: str, summary: str):
+        self._write_json(os.path.join("summaries", f"{section_name}.json"), {
+            "section": section_name,
+            "research_area": self.research_area,
+            "timestamp": datetime.now().isoformat(),
+            "summary": summary
+        })
+
+    def load_sections(self) -> Dict[str, str]:
+        sections = {}
+        for filename in os.listdir(self._path("latex")):
+            if filename.endswith(".tex"):
+                with open(self._path("latex", filename), "r", encoding="utf-8") as f:
+                    sections[filename[:-len(".tex")]] = f.read()
+        return sections
+
+    def save_section(self, section_name: str, latex_content: str):
+        self._write_text(os.path.join("latex", f"{section_name}.tex"), latex_content)
@@ -1,32 +1,96 @@
 # src/models/survey_model.py
 
 import asyncio
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
 import os
+import re
 import json
 import time
 from datetime import datetime
-from ..agents.gemini_agent import GeminiAgent
-from ..agents.deepseek_agent import DeepSeekAgent
-from config.settings import OUTPUT_DIR, TEMP_DIR
+from ..agents.registry import get_agent
+from ..agents.model_router import ModelRouter
+from ..utils.metrics import get_metrics, job_context, current_job_id
+from .survey_job import SurveyJob
+from .living_survey import LivingSurvey
+from .token_budget import TokenBudgetPlanner, target_words
+from ..utils.token_utils import estimate_tokens
+from ..utils.extraction_cache import file_content_hash
+from config.settings import (
+    OUTPUT_DIR,
+    TEMP_DIR,
+    MAX_CONCURRENT_SECTIONS,
+    MIN_PAGES,
+    MAX_PAGES,
+    TOKENS_PER_PAGE,
+    PIPELINE_QUEUE_SIZE,
+    INCREMENTAL_REGENERATE_FRACTION,
+    ROUTER_ENABLED
+)
 
 class SurveyGenerator:
-    def __init__(self):
-        self.gemini_agent = GeminiAgent()
-        self.deepseek_agent = DeepSeekAgent()
-        self.section_order = [
-            'introduction',
-            'background',
-            'methodology',
-            'results',
-            'discussion',
-            'conclusion'
-        ]
+    SECTION_ORDER = [
+        'introduction',
+        'background',
+        'methodology',
+        'results',
+        'discussion',
+        'conclusion'
+    ]
+
+    def __init__(self, max_concurrent_sections: int = MAX_CONCURRENT_SECTIONS):
+        # Agents come from the shared registry on first use; assign to override per generator
+        self._agents = {}
+        self._router = None
+        self.max_concurrent_sections = max_concurrent_sections
+        self.section_order = list(self.SECTION_ORDER)
         
         # Create output directory if it doesn't exist
         os.makedirs(OUTPUT_DIR, exist_ok=True)
         os.makedirs(TEMP_DIR, exist_ok=True)
 
+    def _agent(self, name: str):
+        if name not in self._agents:
+            self._agents[name] = get_agent(name)
+        return self._agents[name]
+
+    @property
+    def gemini_agent(self):
+        agent = self._agent("gemini")
+        if agent.use_router and self.router is not None:
+            # Summaries go through this generator's router too, so they are offloaded to the same
+            # local pool its sections are generated on
+            agent.router = self.router
+        return agent
+
+    @gemini_agent.setter
+    def gemini_agent(self, agent):
+        self._agents["gemini"] = agent
+        self._router = None
+
+    @property
+    def deepseek_agent(self):
+        return self._agent("deepseek")
+
+    @deepseek_agent.setter
+    def deepseek_agent(self, agent):
+        self._agents["deepseek"] = agent
+
+    @property
+    def async_deepseek_agent(self):
+        return self._agent("async_deepseek")
+
+    @async_deepseek_agent.setter
+    def async_deepseek_agent(self, agent):
+        self._agents["async_deepseek"] = agent
+        self._router = None
+
+    @property
+    def router(self) -> Optional[ModelRouter]:
+        """Router for async summaries and section generation over this generator's agents, or None when routing is off"""
+        if self._router is None and ROUTER_ENABLED:
+            self._router = ModelRouter(gemini_agent=self._agent("gemini"), local_agent=self.async_deepseek_agent)
+        return self._router
+
     def save_summaries_to_temp(self, summaries: Dict[str, str], research_area: str) -> str:
         """Save summaries to a readable JSON file in the temp directory"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -50,7 +114,8 @@ class SurveyGenerator:
             data = json.load(f)
             return data["summaries"]
 
-    def generate_section_prompt(self, section_name: str, summary: str, research_area: str) -> str:
+    def generate_section_prompt(self, section_name: str, summary: str, research_area: str,
+                                target_tokens: Optional[int] = None) -> str:
         """Generate appropriate prompts for each section"""
         prompts = {
             'introduction': f"""
@@ -132,7 +197,10 @@ class SurveyGenerator:
             """
         }
         
-        return prompts.get(section_name, "")
+        prompt = prompts.get(section_name, "")
+        if prompt and target_tokens:
+            prompt += f"The section should be about {target_words(target_tokens)} words long.\n"
+        return prompt
 
     def generate_latex_header(self, research_area: str) -> str:
         """Generate LaTeX header with proper formatting"""
@@ -168,66 +236,635 @@ methodologies, and future directions in the field.
         """Generate LaTeX footer"""
         return "\n\\end{document}"
 
-    def process_section(self, section_name: str, summary: str, research_area: str) -> str:
+    def process_section(self, section_name: str, summary: str, research_area: str,
+                        planner: Optional[TokenBudgetPlanner] = None) -> str:
         """Process a single section using DeepSeek"""
-        prompt = self.generate_section_prompt(section_name, summary, research_area)
-        section_content = self.deepseek_agent.generate_section(prompt, section_name)
+        target, max_tokens = self._section_budget(section_name, planner)
+        prompt = self.generate_section_prompt(section_name, summary, research_area, target)
+        try:
+            section_content = self.deepseek_agent.generate_section(prompt, section_name, max_tokens=max_tokens)
+        except Exception:
+            if planner is not None:
+                planner.release(section_name)
+            raise
+        self._record_section_tokens(section_name, section_content, planner)
         return section_content
 
-    async def generate_survey(self, pdf_files: List[str], research_area: str) -> str:
-        """Main method to generate the complete survey"""
+    async def process_section_async(self, section_name: str, summary: str, research_area: str,
+                                    planner: Optional[TokenBudgetPlanner] = None) -> str:
+        """Process a single section using the async DeepSeek client"""
+        target, max_tokens = self._section_budget(section_name, planner)
+        prompt = self.generate_section_prompt(section_name, summary, research_area, target)
         try:
-            # Step 1: Process PDFs and get summaries using Gemini
-            section_summaries = self.gemini_agent.process_pdf(pdf_files)
+            if self.router is not None:
+                section_content = await self.router.generate_section_async(prompt, section_name, max_tokens=max_tokens)
+            else:
+                section_content = await self.async_deepseek_agent.generate_section(prompt, section_name, max_tokens=max_tokens)
+        except Exception:
+            if planner is not None:
+                planner.release(section_name)
+            raise
+        self._record_section_tokens(section_name, section_content, planner)
+        return section_content
+
+    def make_budget_planner(self, section_names: List[str], existing: Optional[Dict[str, str]] = None) -> TokenBudgetPlanner:
+        """Budget planner for a survey's sections, counting already generated ones against the target"""
+        planner = TokenBudgetPlanner(section_names)
+        for section_name, content in (existing or {}).items():
+            planner.record(section_name, estimate_tokens(content))
+        return planner
+
+    def _section_budget(self, section_name: str,
+                        planner: Optional[TokenBudgetPlanner]) -> Tuple[Optional[int], Optional[int]]:
+        """(target, max_tokens) for the next generation of a section, or (None, None) without a planner"""
+        if planner is None:
+            return None, None
+        target = planner.allocate(section_name)
+        return target, planner.max_tokens(target)
+
+    def _record_section_tokens(self, section_name: str, content: str, planner: Optional[TokenBudgetPlanner]):
+        if planner is None:
+            return
+        planner.record(section_name, estimate_tokens(content))
+        get_metrics().event("section_budget", section=section_name, **planner.summary())
+
+    async def generate_sections(self,
+                                section_summaries: Dict[str, str],
+                                research_area: str,
+                                existing: Optional[Dict[str, str]] = None,
+                                on_section: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """Generate all sections concurrently, at most max_concurrent_sections at a time.
+
+        Sections already in `existing` are reused; on_section is called as each new one completes.
+        """
+        existing = existing or {}
+        planner = self.make_budget_planner(
+            [name for name in self.section_order if name in section_summaries],
+            {name: content for name, content in existing.items() if name in section_summaries}
+        )
+        queue: asyncio.Queue = asyncio.Queue()
+        for name in self.section_order:
+            if name in section_summaries and name not in existing:
+                queue.put_nowait((name, section_summaries[name]))
+        for _ in range(self.max_concurrent_sections):
+            queue.put_nowait(None)
+        generated = await self.generate_from_queue(queue, research_area, planner, on_section)
+        return self._in_section_order({**generated, **existing})
+
+    async def generate_from_queue(self,
+                                  queue: asyncio.Queue,
+                                  research_area: str,
+                                  planner: Optional[TokenBudgetPlanner] = None,
+                                  on_section: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """Generation stage: max_concurrent_sections workers turn queued (section, summary) pairs into LaTeX.
+
+        Each worker stops at a None sentinel, so the producer must enqueue one per worker.
+        """
+        generated = {}
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                section_name, summary = item
+                try:
+                    with get_metrics().span("generate_section", section=section_name):
+                        latex_content = await self.process_section_async(section_name, summary, research_area, planner)
+                    generated[section_name] = latex_content
+                    if on_section is not None:
+                        on_section(section_name, latex_content)
+                except Exception as e:
+                    print(f"Error generating section {section_name}: {str(e)}")
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrent_sections)))
+        return generated
+
+    def _in_section_order(self, sections: Dict[str, str]) -> Dict[str, str]:
+        return {name: sections[name] for name in self.section_order if sections.get(name) is not None}
+
+    def extract_for_job(self, job: SurveyJob) -> Dict[str, List[str]]:
+        """Extract the job's PDFs, reusing and writing its extraction checkpoint"""
+        metrics = get_metrics()
+        all_sections = job.load_extraction()
+        if all_sections is None:
+            with metrics.span("extract"):
+                all_sections, errors = self.gemini_agent.extract_sections(job.pdf_files)
+            job.save_extraction(all_sections)
+            job.set_status("running", skipped_pdfs=errors)
+        else:
+            metrics.event("checkpoint_reused", stage="extract")
+        return all_sections
 
-            if not section_summaries:
+    async def prepare_pipeline(self, job: SurveyJob, skip=()) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """Checkpointed summaries and the summarization inputs of every other section not in `skip`.
+
+        Extraction stays a barrier: deduplication and retrieval compare passages across all papers.
+        """
+        all_sections = await asyncio.to_thread(self.extract_for_job, job)
+        existing = {name: summary for name, summary in job.load_summaries().items() if name not in skip}
+        if existing:
+            get_metrics().event("checkpoint_reused", stage="summarize", sections=sorted(existing))
+        inputs = await asyncio.to_thread(
+            self.gemini_agent.prepare_section_inputs,
+            all_sections,
+            set(existing) | set(skip),
+            job.research_area
+        )
+        return existing, inputs
+
+    async def summarize_for_job(self, job: SurveyJob, section_name: str, contents: List[str]) -> str:
+        """Summarize one section with the async Gemini client and checkpoint the result"""
+        with get_metrics().span("summarize_section", section=section_name):
+            summary = await self.gemini_agent.summarize_section_hierarchical_async(contents, section_name)
+        job.save_summary(section_name, summary)
+        return summary
+
+    async def summarize_into(self,
+                             job: SurveyJob,
+                             existing: Dict[str, str],
+                             inputs: Dict[str, List[str]],
+                             queue: asyncio.Queue,
+                             consumers: int) -> Dict[str, str]:
+        """Summarization stage: queue checkpointed summaries, then each new one as soon as it lands.
+
+        Sections are summarized concurrently; a failed section is reported and left out.
+        Returns every available summary once a sentinel has been queued for each consumer.
+        """
+        summaries = dict(existing)
+        try:
+            for name in self.section_order:
+                if name in existing:
+                    await queue.put((name, existing[name]))
+
+            async def summarize(section_name: str):
+                try:
+                    summary = await self.summarize_for_job(job, section_name, inputs[section_name])
+                except Exception as e:
+                    print(f"Error summarizing section {section_name}: {str(e)}")
+                    return
+                summaries[section_name] = summary
+                await queue.put((section_name, summary))
+
+            await asyncio.gather(*(summarize(name) for name in self.section_order if name in inputs))
+        finally:
+            for _ in range(consumers):
+                await queue.put(None)
+        return summaries
+
+    def prepare_summaries(self, job: SurveyJob) -> Dict[str, str]:
+        """Extract and summarize the job's PDFs, reusing and writing its checkpoints"""
+        metrics = get_metrics()
+        all_sections = self.extract_for_job(job)
+
+        existing = job.load_summaries()
+        if existing:
+            metrics.event("checkpoint_reused", stage="summarize", sections=sorted(existing))
+        with metrics.span("summarize"):
+            return self.gemini_agent.summarize_sections(all_sections, existing, on_summary=job.save_summary,
+                                                        research_area=job.research_area)
+
+    async def generate_survey(self, pdf_files: List[str], research_area: str, job_id: Optional[str] = None,
+                              fresh: bool = False) -> str:
+        """Main method to generate the complete survey.
+
+        Re-running with the same inputs (or job_id) resumes an unfinished job from its
+        checkpoints; a complete job, or any job when fresh is set, is generated again.
+        """
+        job = SurveyJob.open(research_area, pdf_files, job_id, fresh=fresh)
+        with job_context(job.job_id):
+            return await self._generate_survey(job)
+
+    async def _generate_survey(self, job: SurveyJob) -> str:
+        research_area = job.research_area
+        metrics = get_metrics()
+        metrics.event("job_started", research_area=research_area, papers=len(job.pdf_files))
+        job.set_status("running")
+        try:
+            # Step 1: Extract the PDFs and prepare each section's summarization input
+            existing_sections = job.load_sections()
+            existing_summaries, inputs = await self.prepare_pipeline(job, skip=existing_sections)
+            section_names = [
+                name for name in self.section_order
+                if name in existing_summaries or name in inputs or name in existing_sections
+            ]
+            if not section_names:
                 raise ValueError("Failed to generate section summaries")
-            
-            summaries_filepath = self.save_summaries_to_temp(section_summaries, research_area)
-            print(f"Summaries saved to: {summaries_filepath}")
-            
-            # Step 2: Generate LaTeX content for each section using DeepSeek
-            latex_sections = {}
-            for section_name in self.section_order:
-                if section_name in section_summaries:
-                    try:
-                        summary = section_summaries[section_name]
-                        latex_content = self.process_section(
-                            section_name, 
-                            summary, 
-                            research_area
-                        )
-                        latex_sections[section_name] = latex_content
-                        print(f"Section {section_name} generated by DeepSeek!")
-                        await asyncio.sleep(1)
-                    except Exception as e:
-                        print(f"Error generating section {section_name}: {str(e)}")
-                        continue
+
+            # Step 2: Summarize with Gemini and generate LaTeX with DeepSeek as overlapping stages;
+            # each section's generation starts as soon as its summary lands
+            planner = self.make_budget_planner(section_names, existing_sections)
+            queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            with metrics.span("summarize_and_generate"):
+                summarizing = asyncio.create_task(
+                    self.summarize_into(job, existing_summaries, inputs, queue, self.max_concurrent_sections)
+                )
+                generated = await self.generate_from_queue(queue, research_area, planner, on_section=job.save_section)
+                await summarizing
+            latex_sections = self._in_section_order({**generated, **existing_sections})
 
             if not latex_sections:
                 raise ValueError("Failed to generate any LaTeX sections")
             
-            # Step 3: Combine all sections into a complete LaTeX document
-            header = self.generate_latex_header(research_area)
-            footer = self.generate_latex_footer()
+            # Step 3: Combine all sections into a complete LaTeX document and save it
+            filepath = self.write_survey(research_area, latex_sections, job.job_id)
             
-            full_content = [header]
-            for section_name in self.section_order:
-                if section_name in latex_sections:
-                    full_content.append(latex_sections[section_name])
-            full_content.append(footer)
+            missing = [name for name in section_names if name not in latex_sections]
+            job.set_status("incomplete" if missing else "complete", output=filepath, missing_sections=missing)
+            metrics.event("job_finished", status="ok", path=filepath)
+            return filepath
             
-            # Step 4: Save the complete survey
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"{research_area}_survey_{timestamp}.tex"
+        except Exception as e:
+            job.set_status("failed", error=str(e))
+            metrics.event("job_finished", status="error", error=str(e))
+            print(f"Error generating survey: {str(e)}")
+            raise
+
+    def _output_path(self, research_area: str, job_id: str) -> str:
+        """Create a new, empty .tex file in OUTPUT_DIR for this job and return its path.
+
+        The research area is reduced to a safe file name, and the job ID plus exclusive
+        creation keep runs finishing in the same second from overwriting each other.
+        """
+        safe_area = re.sub(r"[^\w-]+", "_", research_area).strip("_")[:80] or "untitled"
+        safe_job_id = re.sub(r"[^\w-]+", "_", job_id)
+        stem = f"{safe_area}_survey_{time.strftime('%Y%m%d_%H%M%S')}_{safe_job_id}"
+        attempt = 0
+        while True:
+            filename = f"{stem}.tex" if attempt == 0 else f"{stem}_{attempt}.tex"
             filepath = os.path.join(OUTPUT_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write('\n\n'.join(full_content))
-            
+            try:
+                with open(filepath, 'x', encoding='utf-8'):
+                    return filepath
+            except FileExistsError:
+                attempt += 1
+
+    def write_survey(self, research_area: str, latex_sections: Dict[str, str], job_id: str) -> str:
+        """Combine the sections into a complete LaTeX document and save it to OUTPUT_DIR"""
+        header = self.generate_latex_header(research_area)
+        footer = self.generate_latex_footer()
+        
+        full_content = [header]
+        for section_name in self.section_order:
+            if section_name in latex_sections:
+                full_content.append(latex_sections[section_name])
+        full_content.append(footer)
+        
+        filepath = self._output_path(research_area, job_id)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(full_content))
+        return filepath
+
+    async def update_survey(self, pdf_files: List[str], research_area: str, survey_id: Optional[str] = None) -> str:
+        """Bring the living survey of a research area up to date with `pdf_files`.
+
+        Only papers the survey hasn't seen are extracted and summarized; their partial
+        summaries are merged into the existing section summaries. Removing a paper drops
+        the partial summaries it contributed to and re-summarizes the rest of their batch.
+        A section is only regenerated once papers added or removed since it was written
+        make up INCREMENTAL_REGENERATE_FRACTION of its source text.
+        """
+        survey = LivingSurvey.open(research_area, survey_id)
+        with job_context(survey.job_id):
+            return await self._update_survey(survey, pdf_files)
+
+    def _section_sources(self, paper_sections: Dict[str, Dict[str, str]], section_name: str) -> Dict[str, int]:
+        """Estimated tokens each paper contributes to a section, for papers that have it"""
+        return {
+            content_hash: estimate_tokens(sections[section_name])
+            for content_hash, sections in paper_sections.items()
+            if sections.get(section_name)
+        }
+
+    def plan_section_updates(self, survey: LivingSurvey, paper_sections: Dict[str, Dict[str, str]]) -> Dict[str, Dict]:
+        """Summary work for each section whose summary doesn't cover exactly the current papers.
+
+        Each plan holds the papers to summarize as a new batch and their contents, the
+        summaries to merge the new partial summary into, and the stale partial summaries
+        to drop. Without removals the existing section summary is the merge base;
+        otherwise the partial summaries that don't involve a removed paper are.
+        """
+        plans = {}
+        for section_name in self.section_order:
+            record = survey.load_summary_record(section_name)
+            covered = set(record["papers"]) if record is not None else set()
+            if record is not None and covered == set(paper_sections):
+                continue
+
+            partials = survey.load_partials(section_name)
+            kept = [partial for partial in partials if set(partial["papers"]) <= covered & set(paper_sections)]
+            stale = [partial for partial in partials if partial not in kept]
+            resummarize = {content_hash for partial in stale for content_hash in partial["papers"]}
+            batch = [
+                content_hash for content_hash, sections in paper_sections.items()
+                if sections.get(section_name) and (content_hash not in covered or content_hash in resummarize)
+            ]
+            if record is not None and not stale:
+                base = [record["summary"]]
+            else:
+                base = [partial["summary"] for partial in kept]
+            plans[section_name] = {
+                "batch": batch,
+                "contents": [paper_sections[content_hash][section_name] for content_hash in batch],
+                "base": base,
+                "stale": [partial["id"] for partial in stale]
+            }
+        return plans
+
+    async def update_section_summary(self,
+                                     survey: LivingSurvey,
+                                     section_name: str,
+                                     plan: Dict,
+                                     contents: List[str],
+                                     papers: List[str]) -> Optional[str]:
+        """Summarize a section's new batch, merge it into the plan's base and checkpoint the result.
+
+        Returns None, dropping the section, when no paper has content for it anymore.
+        """
+        summaries = list(plan["base"])
+        partial = None
+        if contents:
+            with get_metrics().span("summarize_section", section=section_name):
+                partial = await self.gemini_agent.summarize_section_hierarchical_async(contents, section_name)
+            summaries.append(partial)
+
+        summary = None
+        if summaries:
+            with get_metrics().span("merge_summaries", section=section_name, partials=len(summaries)):
+                summary = await self.gemini_agent.combine_summaries_async(summaries, section_name)
+
+        if partial is not None:
+            survey.save_partial(section_name, plan["batch"], partial)
+        for partial_id in plan["stale"]:
+            survey.remove_partial(section_name, partial_id)
+        if summary is None:
+            survey.remove_section(section_name)
+        else:
+            survey.save_summary(section_name, summary, papers)
+        return summary
+
+    def needs_regeneration(self, survey: LivingSurvey, section_name: str, sources: Dict[str, int],
+                           existing_sections: Dict[str, str]) -> bool:
+        """Whether a section's LaTeX is missing or its source text changed materially since it was written"""
+        if section_name not in existing_sections:
+            return True
+        written_from = survey.load_section_sources(section_name)
+        changed_tokens = sum(tokens for content_hash, tokens in sources.items() if content_hash not in written_from)
+        changed_tokens += sum(tokens for content_hash, tokens in written_from.items() if content_hash not in sources)
+        return changed_tokens >= INCREMENTAL_REGENERATE_FRACTION * max(sum(sources.values()), 1)
+
+    async def update_summaries_into(self,
+                                    survey: LivingSurvey,
+                                    paper_sections: Dict[str, Dict[str, str]],
+                                    plans: Dict[str, Dict],
+                                    inputs: Dict[str, List[str]],
+                                    planner: TokenBudgetPlanner,
+                                    queue: asyncio.Queue,
+                                    consumers: int) -> List[str]:
+        """Summarization stage of an update: queue each section to regenerate as soon as its summary is ready.
+
+        Returns the sections that still have a summary once a sentinel has been queued for each consumer.
+        """
+        existing_sections = survey.load_sections()
+        remaining = []
+
+        async def queue_if_changed(section_name: str, summary: str):
+            remaining.append(section_name)
+            sources = self._section_sources(paper_sections, section_name)
+            if not self.needs_regeneration(survey, section_name, sources, existing_sections):
+                return
+            survey.remove_section(section_name, keep_summary=True)
+            planner.release(section_name)
+            await queue.put((section_name, summary))
+
+        async def update(section_name: str):
+            try:
+                summary = await self.update_section_summary(
+                    survey, section_name, plans[section_name], inputs.get(section_name, []), list(paper_sections)
+                )
+            except Exception as e:
+                print(f"Error summarizing section {section_name}: {str(e)}")
+                return
+            if summary is None:
+                planner.release(section_name)
+            else:
+                await queue_if_changed(section_name, summary)
+
+        try:
+            updates = []
+            for section_name in self.section_order:
+                if section_name in plans:
+                    updates.append(update(section_name))
+                else:
+                    # Up-to-date summaries still need their LaTeX if an earlier generation failed
+                    record = survey.load_summary_record(section_name)
+                    if record is not None:
+                        updates.append(queue_if_changed(section_name, record["summary"]))
+            await asyncio.gather(*updates)
+        finally:
+            for _ in range(consumers):
+                await queue.put(None)
+        return [name for name in self.section_order if name in remaining]
+
+    async def _update_survey(self, survey: LivingSurvey, pdf_files: List[str]) -> str:
+        research_area = survey.research_area
+        metrics = get_metrics()
+        survey.set_status("running", skipped_pdfs={})
+        try:
+            # Step 1: Extract only the papers the survey hasn't seen
+            papers: Dict[str, str] = {}
+            for pdf_path in pdf_files:
+                papers.setdefault(file_content_hash(pdf_path), pdf_path)
+            new_files = [pdf_path for content_hash, pdf_path in papers.items() if survey.load_paper(content_hash) is None]
+            if new_files:
+                with metrics.span("extract", papers=len(new_files)):
+                    extracted, errors = await asyncio.to_thread(self.gemini_agent.extract_paper_sections, new_files)
+                survey.set_status("running", skipped_pdfs=errors)
+                for content_hash, pdf_path in papers.items():
+                    if pdf_path in extracted:
+                        survey.save_paper(content_hash, extracted[pdf_path])
+
+            paper_sections = {}
+            for content_hash in papers:
+                sections = survey.load_paper(content_hash)
+                if sections is not None:
+                    paper_sections[content_hash] = sections
+            if not paper_sections:
+                raise ValueError("Failed to extract any of the PDF files")
+            known = survey.papers()
+            added = [content_hash for content_hash in paper_sections if content_hash not in known]
+            removed = [content_hash for content_hash in known if content_hash not in paper_sections]
+            metrics.event("job_started", research_area=research_area, papers=len(paper_sections),
+                          added=len(added), removed=len(removed), incremental=True)
+
+            # Step 2: Prepare the new batch of each section whose summary is out of date
+            plans = self.plan_section_updates(survey, paper_sections)
+            inputs = await asyncio.to_thread(
+                self.gemini_agent.prepare_section_inputs,
+                {name: plan["contents"] for name, plan in plans.items()},
+                (),
+                research_area
+            )
+            section_names = [
+                name for name in self.section_order
+                if name in plans and (plans[name]["base"] or plans[name]["contents"])
+                or name not in plans and survey.load_summary_record(name) is not None
+            ]
+
+            # Step 3: Merge summaries and regenerate the sections that changed as overlapping stages
+            planner = self.make_budget_planner(section_names, survey.load_sections())
+            queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            with metrics.span("update_and_generate", sections=len(plans)):
+                updating = asyncio.create_task(self.update_summaries_into(
+                    survey, paper_sections, plans, inputs, planner, queue, self.max_concurrent_sections
+                ))
+                generated = await self.generate_from_queue(
+                    queue, research_area, planner,
+                    on_section=lambda name, latex: survey.save_section(
+                        name, latex, self._section_sources(paper_sections, name)
+                    )
+                )
+                section_names = await updating
+
+            latex_sections = self._in_section_order({
+                name: content for name, content in survey.load_sections().items() if name in section_names
+            })
+            if not latex_sections:
+                raise ValueError("Failed to generate any LaTeX sections")
+
+            # Step 4: Combine all sections into a complete LaTeX document and save it
+            filepath = self.write_survey(research_area, latex_sections, survey.job_id)
+
+            for content_hash in removed:
+                survey.remove_paper(content_hash)
+            missing = [name for name in section_names if name not in latex_sections]
+            survey.set_status(
+                "incomplete" if missing else "complete",
+                output=filepath,
+                missing_sections=missing,
+                papers={content_hash: papers[content_hash] for content_hash in paper_sections},
+                pdf_files=[papers[content_hash] for content_hash in paper_sections],
+                regenerated_sections=sorted(generated)
+            )
+            metrics.event("job_finished", status="ok", path=filepath, regenerated=sorted(generated))
             return filepath
-            
+
+        except Exception as e:
+            survey.set_status("failed", error=str(e))
+            metrics.event("job_finished", status="error", error=str(e))
+            print(f"Error updating survey: {str(e)}")
+            raise
+
+    async def generate_survey_stream(self, pdf_files: List[str], research_area: str,
+                                     job_id: Optional[str] = None,
+                                     fresh: bool = False) -> AsyncIterator[Tuple[str, str, Optional[str]]]:
+        """Generate the survey while streaming tokens from the local LLM.
+
+        Yields (section_name, partial_section_text, None) as tokens arrive and a final
+        ("", "", filepath) once the document is complete. Each finished section is
+        appended to the .tex file immediately, so only one section is held in memory.
+        Sections checkpointed by an unfinished earlier run of the same job are written
+        without regenerating, unless fresh is set.
+        """
+        job = SurveyJob.open(research_area, pdf_files, job_id, fresh=fresh)
+        job_token = current_job_id.set(job.job_id)
+        try:
+            async for item in self._generate_survey_stream(job):
+                yield item
+        finally:
+            current_job_id.reset(job_token)
+
+    async def _generate_survey_stream(self, job: SurveyJob) -> AsyncIterator[Tuple[str, str, Optional[str]]]:
+        research_area = job.research_area
+        metrics = get_metrics()
+        metrics.event("job_started", research_area=research_area, papers=len(job.pdf_files), streaming=True)
+        job.set_status("running")
+        try:
+            existing_sections = job.load_sections()
+            section_summaries, inputs = await self.prepare_pipeline(job, skip=existing_sections)
+            section_names = [
+                name for name in self.section_order
+                if name in section_summaries or name in inputs or name in existing_sections
+            ]
+
+            if not section_names:
+                raise ValueError("Failed to generate section summaries")
+
+            planner = self.make_budget_planner(section_names, existing_sections)
+            # Sections are written in order, but every summary starts now so later ones are
+            # ready by the time the earlier sections have streamed
+            summary_tasks = {
+                name: asyncio.create_task(self.summarize_for_job(job, name, inputs[name]))
+                for name in section_names if name in inputs
+            }
+
+            filepath = self._output_path(research_area, job.job_id)
+
+            sections_written = 0
+            try:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(self.generate_latex_header(research_area))
+
+                    for section_name in section_names:
+                        if section_name in existing_sections:
+                            f.write('\n\n')
+                            f.write(existing_sections[section_name])
+                            f.flush()
+                            sections_written += 1
+                            yield section_name, existing_sections[section_name], None
+                            continue
+
+                        if section_name in summary_tasks:
+                            try:
+                                section_summaries[section_name] = await summary_tasks[section_name]
+                            except Exception as e:
+                                print(f"Error summarizing section {section_name}: {str(e)}")
+                                continue
+
+                        target, max_tokens = self._section_budget(section_name, planner)
+                        prompt = self.generate_section_prompt(section_name, section_summaries[section_name], research_area, target)
+                        partial_text = ""
+                        started_at = time.perf_counter()
+                        try:
+                            async for delta in self.async_deepseek_agent.stream_section(prompt, section_name, max_tokens=max_tokens):
+                                if not partial_text:
+                                    metrics.observe("time_to_first_token_seconds", time.perf_counter() - started_at)
+                                partial_text += delta
+                                yield section_name, partial_text, None
+                        except Exception as e:
+                            planner.release(section_name)
+                            print(f"Error generating section {section_name}: {str(e)}")
+                            continue
+
+                        latex_content = self.async_deepseek_agent._format_latex_section(section_name, partial_text)
+                        self._record_section_tokens(section_name, latex_content, planner)
+                        job.save_section(section_name, latex_content)
+                        f.write('\n\n')
+                        f.write(latex_content)
+                        f.flush()
+                        sections_written += 1
+                        metrics.observe("stage_duration_seconds", time.perf_counter() - started_at, stage="generate_section")
+                        metrics.event("section_written", section=section_name, chars=len(partial_text))
+
+                    f.write('\n\n')
+                    f.write(self.generate_latex_footer())
+            finally:
+                # Don't leave summaries running if the consumer stopped early
+                for task in summary_tasks.values():
+                    task.cancel()
+
+            if not sections_written:
+                os.remove(filepath)
+                raise ValueError("Failed to generate any LaTeX sections")
+
+            missing = [name for name in section_names if name not in job.load_sections()]
+            job.set_status("incomplete" if missing else "complete", output=filepath, missing_sections=missing)
+            metrics.event("job_finished", status="ok", path=filepath)
+            yield "", "", filepath
+
         except Exception as e:
+            job.set_status("failed", error=str(e))
+            metrics.event("job_finished", status="error", error=str(e))
             print(f"Error generating survey: {str(e)}")
             raise
 
@@ -236,18 +873,18 @@ methodologies, and future directions in the field.
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 content = f.read()
-                # Rough estimation of pages (about 40 lines per page)
-                num_lines = len(content.split('\n'))
-                estimated_pages = num_lines / 40
-                return 40 <= estimated_pages <= 50
+                # Same page estimate the token budget planner aims for
+                estimated_pages = estimate_tokens(content) / TOKENS_PER_PAGE
+                return MIN_PAGES <= estimated_pages <= MAX_PAGES
         except Exception as e:
             print(f"Error validating survey length: {str(e)}")
             return False
 
 class SurveyProgress:
     """Helper class to track survey generation progress"""
-    def __init__(self):
-        self.total_steps = len(SurveyGenerator().section_order) + 2  # sections + pdf processing + compilation
+    def __init__(self, total_steps: Optional[int] = None):
+        # sections + pdf processing + compilation
+        self.total_steps = total_steps or len(SurveyGenerator.SECTION_ORDER) + 2
         self.current_step = 0
         self.status_message = ""
 
@@ -257,4 +894,4 @@ class SurveyProgress:
 
     @property
     def progress_percentage(self) -> float:
-        return (self.current_step / self.total_steps) * 100
\ No newline at end of file
+        return min(self.current_step / self.total_steps, 1.0) * 100
\ No newline at end of file
@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional
+from config.settings import (
+    MIN_PAGES,
+    MAX_PAGES,
+    TOKENS_PER_PAGE,
+    SECTION_TOKEN_WEIGHTS,
+    SECTION_MIN_TOKENS,
+    SECTION_MAX_TOKENS,
+    SECTION_TOKEN_HEADROOM
+)
+
+# Words per estimated token of generated LaTeX, allowing for markup
+WORDS_PER_TOKEN = 0.65
+
+def target_words(tokens: int) -> int:
+    """Length to ask the model for, in words, for a token target"""
+    return int(tokens * WORDS_PER_TOKEN) // 50 * 50 or 50
+
+class TokenBudgetPlanner:
+    """Splits the survey's target length into per-section completion budgets.
+
+    The target sits midway between MIN_PAGES and MAX_PAGES. Each section is
+    allocated its weighted share of whatever the finished and in-flight sections
+    have not used yet, so sections that come in long or short shift the budgets
+    of the sections still to be generated.
+    """
+    def __init__(self,
+                 sections: List[str],
+                 min_pages: int = MIN_PAGES,
+                 max_pages: int = MAX_PAGES,
+                 tokens_per_page: int = TOKENS_PER_PAGE,
+                 weights: Optional[Dict[str, float]] = None,
+                 min_section_tokens: int = SECTION_MIN_TOKENS,
+                 max_section_tokens: int = SECTION_MAX_TOKENS,
+                 headroom: float = SECTION_TOKEN_HEADROOM):
+        self.sections = list(sections)
+        self.tokens_per_page = tokens_per_page
+        self.target_tokens = (min_pages + max_pages) * tokens_per_page // 2
+        self.max_total_tokens = max_pages * tokens_per_page
+        self.weights = weights or SECTION_TOKEN_WEIGHTS
+        self.min_section_tokens = min_section_tokens
+        self.max_section_tokens = max_section_tokens
+        self.headroom = headroom
+        self.produced: Dict[str, int] = {}
+        self.allocated: Dict[str, int] = {}
+
+    def _weight(self, section: str) -> float:
+        return self.weights.get(section, 1.0 / max(len(self.sections), 1))
+
+    def allocate(self, section: str) -> int:
+        """Target completion tokens for a section about to be generated"""
+        self.allocated.pop(section, None)
+        used = sum(self.produced.values()) + sum(self.allocated.values())
+        remaining = self.target_tokens - used
+        waiting = [name for name in self.sections if name not in self.produced and name not in self.allocated]
+        if section not in waiting:
+            waiting.append(section)
+        share = remaining * self._weight(section) / sum(self._weight(name) for name in waiting)
+        # Never plan past MAX_PAGES, but always leave room for a minimal section
+        ceiling = max(self.max_total_tokens - used, self.min_section_tokens)
+        target = int(min(max(share, self.min_section_tokens), self.max_section_tokens, ceiling))
+        self.allocated[section] = target
+        return target
+
+    def max_tokens(self, target: int) -> int:
+        """Completion cap for a section target, leaving room to finish the last paragraph"""
+        return min(int(target * self.headroom), self.max_section_tokens)
+
+    def record(self, section: str, tokens: int):
+        """Register the tokens a section actually produced"""
+        self.allocated.pop(section, None)
+        self.produced[section] = tokens
+
+    def release(self, section: str):
+        """Return a failed section's allocation, or a section's tokens before it is regenerated, to the pool"""
+        self.allocated.pop(section, None)
+        self.produced.pop(section, None)
+
+    def estimated_pages(self) -> float:
+        return sum(self.produced.values()) / self.tokens_per_page
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "target_tokens": self.target_tokens,
+            "produced_tokens": sum(self.produced.values()),
+            "estimated_pages": round(self.estimated_pages(), 2)
+        }
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from typing import Dict
+
+class ConcurrencyLimiter:
+    """Caps in-flight calls across threads and event loops.
+
+    Usable as `with limiter:` from threads and `async with limiter:` from coroutines;
+    async waiters poll instead of parking a thread, which is fine for LLM calls that
+    take seconds.
+    """
+    def __init__(self, limit: int, poll_interval: float = 0.05):
+        self.limit = limit
+        self.poll_interval = poll_interval
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+
+    def acquire(self):
+        self._semaphore.acquire()
+        with self._lock:
+            self.in_use += 1
+
+    async def acquire_async(self):
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(self.poll_interval)
+        with self._lock:
+            self.in_use += 1
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+_shared_limiters: Dict[str, ConcurrencyLimiter] = {}
+_shared_limiters_lock = threading.Lock()
+
+def get_concurrency_limiter(name: str, limit: int) -> ConcurrencyLimiter:
+    """Return the process-wide concurrency limiter for name, creating it on first use"""
+    with _shared_limiters_lock:
+        if name not in _shared_limiters:
+            _shared_limiters[name] = ConcurrencyLimiter(limit)
+        return _shared_limiters[name]
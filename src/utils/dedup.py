@@ -0,0 +1,119 @@
+import re
+import zlib
+from typing import Dict, List, Tuple
+import numpy as np
+from .token_utils import estimate_tokens
+from config.settings import (
+    DEDUP_SIMILARITY_THRESHOLD,
+    DEDUP_SHINGLE_SIZE,
+    DEDUP_NUM_PERM
+)
+
+# Extracted text has no paragraph breaks, so sentences are the unit that lines up across papers
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])(\s+)')
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Smallest prime above 2**32, so every crc32 shingle hash fits below it
+_PRIME = np.uint64(4294967311)
+_ROWS_PER_BAND = 4
+_MAX_BATCH_SHINGLES = 16384
+
+def shingle_hashes(text: str, size: int = DEDUP_SHINGLE_SIZE) -> np.ndarray:
+    """Hashes of the distinct word shingles of a text"""
+    words = WORD_PATTERN.findall(text.lower())
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+class Deduplicator:
+    """Drops sentences that nearly repeat one seen earlier in the same batch of papers.
+
+    Similarity is the Jaccard index of word shingles, estimated with MinHash
+    signatures; locality-sensitive hashing over signature bands keeps the
+    comparison count close to linear.
+    """
+    def __init__(self,
+                 threshold: float = DEDUP_SIMILARITY_THRESHOLD,
+                 shingle_size: int = DEDUP_SHINGLE_SIZE,
+                 num_perm: int = DEDUP_NUM_PERM,
+                 seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm - num_perm % _ROWS_PER_BAND
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 31, size=(self.num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=(self.num_perm, 1), dtype=np.uint64)
+        # Sentences, duplicates and estimated tokens of the most recent deduplicate call
+        self.last_stats: Dict[str, int] = {}
+
+    def signatures(self, shingle_sets: List[np.ndarray]) -> np.ndarray:
+        """MinHash signature for each non-empty shingle set, computed in bounded batches"""
+        signatures = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint64)
+        start = 0
+        while start < len(shingle_sets):
+            end = start
+            batch_size = 0
+            while end < len(shingle_sets) and (end == start or batch_size + len(shingle_sets[end]) <= _MAX_BATCH_SHINGLES):
+                batch_size += len(shingle_sets[end])
+                end += 1
+            batch = shingle_sets[start:end]
+            hashed = (self._a * np.concatenate(batch)[None, :] + self._b) % _PRIME
+            offsets = np.cumsum([0] + [len(shingles) for shingles in batch[:-1]])
+            signatures[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            start = end
+        return signatures
+
+    def deduplicate(self, all_sections: Dict[str, List[str]]) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+        """Remove near-duplicate sentences across every paper and section.
+
+        The first occurrence is kept, in section then paper order. Papers left
+        with no content are dropped from their section, but a section that would
+        end up empty keeps its original contents.
+        """
+        # Split every content into sentences, keeping the whitespace that followed each one
+        units = []
+        for section_name, contents in all_sections.items():
+            for paper, content in enumerate(contents):
+                parts = SENTENCE_BREAK.split(content)
+                for i in range(0, len(parts), 2):
+                    separator = parts[i + 1] if i + 1 < len(parts) else ""
+                    units.append((section_name, paper, parts[i], separator))
+
+        shingle_sets = [shingle_hashes(text, self.shingle_size) for _, _, text, _ in units]
+        comparable = [i for i, shingles in enumerate(shingle_sets) if len(shingles)]
+        signatures = self.signatures([shingle_sets[i] for i in comparable])
+
+        duplicates = set()
+        buckets = [dict() for _ in range(self.num_perm // _ROWS_PER_BAND)]
+        for row, unit in enumerate(comparable):
+            signature = signatures[row]
+            bands = [signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND].tobytes() for band in range(len(buckets))]
+            candidates = {kept for band, key in enumerate(bands) for kept in buckets[band].get(key, ())}
+            if any(np.mean(signatures[kept] == signature) >= self.threshold for kept in candidates):
+                duplicates.add(unit)
+                continue
+            for band, key in enumerate(bands):
+                buckets[band].setdefault(key, []).append(row)
+
+        deduplicated: Dict[str, List[str]] = {section_name: [] for section_name in all_sections}
+        kept_parts: Dict[Tuple[str, int], List[str]] = {}
+        for i, (section_name, paper, text, separator) in enumerate(units):
+            if i not in duplicates:
+                kept_parts.setdefault((section_name, paper), []).extend([text, separator])
+        for (section_name, paper), parts in kept_parts.items():
+            content = "".join(parts).strip()
+            if content:
+                deduplicated[section_name].append(content)
+        for section_name, contents in all_sections.items():
+            if contents and not deduplicated[section_name]:
+                deduplicated[section_name] = list(contents)
+                duplicates = {i for i in duplicates if units[i][0] != section_name}
+
+        tokens_before = sum(estimate_tokens(content) for contents in all_sections.values() for content in contents)
+        tokens_after = sum(estimate_tokens(content) for contents in deduplicated.values() for content in contents)
+        self.last_stats = {
+            "sentences": len(units),
+            "duplicates_removed": len(duplicates),
+            "tokens_before": tokens_before,
+            "tokens_removed": tokens_before - tokens_after
+        }
+        return deduplicated, self.last_stats
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+from .metrics import get_metrics
+from config.settings import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES
+
+def file_content_hash(pdf_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, so renamed or re-uploaded copies share an entry"""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """On-disk cache of extracted PDF sections, keyed by content hash and extractor version.
+
+    Entries are JSON files; the least recently used ones are evicted once the
+    directory grows past max_bytes. Access time is tracked through file mtimes.
+    """
+    def __init__(self, cache_dir: str = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, pdf_path: str, extractor_version: str) -> str:
+        return f"{file_content_hash(pdf_path)}-{extractor_version}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Return the cached sections for key, or None on a miss"""
+        path = self._entry_path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    sections = json.load(f)
+                os.utime(path)  # mark as recently used
+            except (OSError, ValueError):
+                self.misses += 1
+                get_metrics().inc("cache_requests_total", cache="extraction", result="miss")
+                return None
+            self.hits += 1
+            get_metrics().inc("cache_requests_total", cache="extraction", result="hit")
+            return sections
+
+    def put(self, key: str, sections: Dict[str, str]):
+        """Store sections for key and evict old entries if over budget"""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(sections, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,185 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+from config.settings import METRICS_ENABLED, METRICS_JSONL_PATH
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (1, 5, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Job the current thread or task is working on; tagged onto every JSON-lines event
+current_job_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_job_id", default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, exported as Prometheus text and JSON-lines events.
+
+    Prometheus series are labelled by stage/backend only; per-job detail goes to the
+    JSON-lines file, where every event carries the current job ID.
+    """
+    def __init__(self, jsonl_path: Optional[str] = METRICS_JSONL_PATH, enabled: bool = METRICS_ENABLED):
+        self.jsonl_path = jsonl_path
+        self.enabled = enabled
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        if enabled and jsonl_path:
+            os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def event(self, event_type: str, **fields):
+        """Append a structured event to the JSON-lines log"""
+        if not self.enabled or not self.jsonl_path:
+            return
+        record = {"ts": time.time(), "event": event_type, "job_id": current_job_id.get(), **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._file_lock:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @contextmanager
+    def span(self, stage: str, **fields):
+        """Time a pipeline stage, recording a duration histogram and a JSON-lines event"""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe("stage_duration_seconds", duration, stage=stage)
+            self.event("stage", stage=stage, status=status, duration_s=round(duration, 6), **fields)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = _format_labels(key, 'le="%s"' % bound)
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    inf_labels = _format_labels(key, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{inf_labels} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serve /metrics in a background thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+_shared_metrics: Optional[MetricsRegistry] = None
+_shared_metrics_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry"""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = MetricsRegistry()
+        return _shared_metrics
+
+@contextmanager
+def job_context(job_id: str):
+    """Tag all metrics events emitted inside the block with job_id"""
+    token = current_job_id.set(job_id)
+    try:
+        yield
+    finally:
+        current_job_id.reset(token)
+
+def record_llm_call(backend: str, latency_s: float, prompt_tokens: Optional[int] = None,
+                    completion_tokens: Optional[int] = None, status: str = "ok", **fields):
+    """Record latency, token counts and outcome of a single LLM request"""
+    metrics = get_metrics()
+    metrics.inc("llm_requests_total", backend=backend, status=status)
+    metrics.observe("llm_request_seconds", latency_s, backend=backend)
+    if prompt_tokens is not None:
+        metrics.inc("llm_prompt_tokens_total", prompt_tokens, backend=backend)
+    if completion_tokens is not None:
+        metrics.inc("llm_completion_tokens_total", completion_tokens, backend=backend)
+    metrics.event(
+        "llm_call",
+        backend=backend,
+        status=status,
+        latency_s=round(latency_s, 6),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        **fields
+    )
@@ -1,12 +1,58 @@
-import PyPDF2
 import re
-from typing import Dict, List, Optional
-import fitz  # PyMuPDF
+import json
+import hashlib
+from typing import Dict, Iterator, List, Optional, Tuple
 import os
-from config.settings import TEMP_DIR
+import time
+from .extraction_cache import ExtractionCache
+from .span_store import SpanStore
+from .metrics import get_metrics, COUNT_BUCKETS
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from config.settings import (
+    TEMP_DIR,
+    MAX_PDF_FILES,
+    PDF_EXTRACTION_WORKERS,
+    PDF_EXTRACTION_TIMEOUT,
+    PDF_STREAMING_PAGE_THRESHOLD,
+    PDF_MAX_PAGES,
+    PDF_MAX_SECTION_CHARS,
+    PDF_USE_OUTLINE,
+    HEADER_SIZE_RATIO,
+    HEADER_MAX_CHARS,
+    HEADER_MAX_BOLD_FRACTION,
+    HEADER_SAMPLE_PAGES
+)
+
+# Bump when the extraction logic changes in a way that alters its output
+EXTRACTOR_VERSION = "5"
+
+HEADER_PATTERN = re.compile(r'\n### (.*?) ###\n')
+# Section numbering in outline titles and in front of headings in the text ("3.", "3.2", "IV.")
+NUMBERING_PATTERN = re.compile(r'^\s*(?:\d+(?:\.\d+)*|[IVXLC]+)[.):]?\s+')
+TRAILING_NUMBERING_PATTERN = re.compile(r'\s+(?:\d+(?:\.\d+)*|[IVXLC]+)[.):]?\s*$')
+
+def _open_pdf(pdf_path: str):
+    """Open a PDF with PyMuPDF, imported on first use since it's slow to load"""
+    import fitz  # PyMuPDF
+    return fitz.open(pdf_path)
 
 class PDFHandler:
-    def __init__(self):
+    def __init__(self,
+                 streaming: Optional[bool] = None,
+                 streaming_page_threshold: int = PDF_STREAMING_PAGE_THRESHOLD,
+                 max_pages: Optional[int] = PDF_MAX_PAGES,
+                 max_section_chars: Optional[int] = PDF_MAX_SECTION_CHARS,
+                 use_outline: bool = PDF_USE_OUTLINE):
+        # streaming=None picks the streaming extractor only for documents over the page threshold
+        self.streaming = streaming
+        self.use_outline = use_outline
+        self.streaming_page_threshold = streaming_page_threshold
+        self.max_pages = max_pages
+        self.max_section_chars = max_section_chars
+        # Pages, spans, header spans and parse time of the most recent process_pdf call
+        self.last_stats: Dict[str, float] = {}
         self.section_keywords = {
             'introduction': ['introduction', '1. introduction', 'i. introduction'],
             'background': ['background', 'related work', 'literature review', '2. background', 'ii. background'],
@@ -16,41 +62,256 @@ class PDFHandler:
             'conclusion': ['conclusion', 'conclusions', 'concluding remarks', '6. conclusion', 'vi. conclusion']
         }
 
+    @property
+    def extractor_version(self) -> str:
+        """Version tag covering the extractor code, the keyword table and output-affecting limits"""
+        config = json.dumps({
+            "keywords": self.section_keywords,
+            "streaming": self.streaming,
+            "streaming_page_threshold": self.streaming_page_threshold,
+            "max_pages": self.max_pages,
+            "max_section_chars": self.max_section_chars,
+            "use_outline": self.use_outline,
+            "header_thresholds": [HEADER_SIZE_RATIO, HEADER_MAX_CHARS, HEADER_MAX_BOLD_FRACTION, HEADER_SAMPLE_PAGES]
+        }, sort_keys=True)
+        return f"v{EXTRACTOR_VERSION}-{hashlib.sha256(config.encode('utf-8')).hexdigest()[:12]}"
+
+    def iter_spans(self, doc) -> Iterator[Tuple[str, bool]]:
+        """Yield (text, is_header) for every span, with header thresholds adapted to the document.
+
+        The body font size and bold fraction are estimated from the first
+        HEADER_SAMPLE_PAGES pages. The remaining pages are read and classified one at a
+        time, so memory is bounded by the sample and the current page, not by the
+        document's length.
+        """
+        page_count = doc.page_count if self.max_pages is None else min(doc.page_count, self.max_pages)
+        sample = SpanStore.from_pages(doc, 0, min(page_count, HEADER_SAMPLE_PAGES))
+        body_size, bold_fraction = sample.body_font_size(), sample.bold_fraction()
+        self.last_stats = {"pages": 0, "spans": 0, "header_spans": 0, "body_font_size": body_size}
+
+        yield from self._classified_spans(sample, body_size, bold_fraction)
+        for page_number in range(sample.pages, page_count):
+            yield from self._classified_spans(SpanStore.from_pages(doc, page_number, page_number + 1),
+                                              body_size, bold_fraction)
+
+    def _classified_spans(self, store: SpanStore, body_size: float, bold_fraction: float) -> Iterator[Tuple[str, bool]]:
+        headers = store.classify_headers(body_size=body_size, bold_fraction=bold_fraction)
+        self.last_stats["pages"] += store.pages
+        self.last_stats["spans"] += len(store)
+        self.last_stats["header_spans"] += int(headers.sum())
+        for i in range(len(store)):
+            yield store.span_text(i), bool(headers[i])
+
     def extract_text_with_formatting(self, pdf_path: str) -> str:
         """Extract text while preserving some formatting using PyMuPDF"""
-        doc = fitz.open(pdf_path)
+        doc = _open_pdf(pdf_path)
         text_with_formatting = []
         
-        for page in doc:
-            blocks = page.get_text("dict")["blocks"]
-            for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            # Check if text is bold or size is larger (potential section header)
-                            if span["flags"] & 2**4 or span["size"] > 10:  # 2**4 is bold flag
-                                text_with_formatting.append(f"\n### {span['text']} ###\n")
-                            else:
-                                text_with_formatting.append(span['text'])
+        for text, is_header in self.iter_spans(doc):
+            if is_header:
+                text_with_formatting.append(f"\n### {text} ###\n")
+            else:
+                text_with_formatting.append(text)
         
         doc.close()
         return " ".join(text_with_formatting)
 
-    def identify_section_boundaries(self, text: str) -> Dict[str, tuple]:
+    def classify_header(self, header: str, seen: Optional[set] = None) -> Optional[str]:
+        """Return the section type whose keywords match the header, skipping types in `seen`"""
+        keyword_pattern, keyword_table = self._keyword_matcher()
+        header = header.lower()
+        if not keyword_pattern.search(header):
+            return None
+        for keyword, section_type, _ in keyword_table:
+            if keyword in header and (seen is None or section_type not in seen):
+                return section_type
+        return None
+
+    def process_pdf_streaming(self, pdf_path: str) -> Dict[str, str]:
+        """Extract sections from the compact span store without building the full formatted text.
+
+        A section starts at the first header matching any of its keywords and ends at
+        the next section start. Text before the first section is dropped, and each
+        section buffer stops growing at max_section_chars.
+        """
+        section_contents = {}
+        current_section = None
+        buffer: List[str] = []
+        buffered_chars = 0
+
+        def flush():
+            if current_section is not None:
+                section_contents[current_section] = " ".join(buffer).strip()
+
+        doc = _open_pdf(pdf_path)
+        try:
+            for text, is_header in self.iter_spans(doc):
+                if is_header:
+                    section_type = self.classify_header(text, seen=section_contents.keys() | {current_section})
+                    if section_type is not None:
+                        flush()
+                        current_section = section_type
+                        buffer = []
+                        buffered_chars = 0
+                        continue
+                    text = f"\n### {text} ###\n"
+
+                if current_section is None:
+                    continue
+                if self.max_section_chars is not None and buffered_chars + len(text) > self.max_section_chars:
+                    continue
+                buffer.append(text)
+                buffered_chars += len(text) + 1
+        finally:
+            doc.close()
+
+        flush()
+        return section_contents
+
+    def outline_sections(self, toc: List[list], page_count: int) -> List[Tuple[str, str, int, Optional[str], int]]:
+        """Locate sections from a document outline (PyMuPDF's get_toc).
+
+        Returns (section type, title, start page, title of the next heading, end page)
+        per section, in outline order. Only the shallowest outline level with a
+        recognizable section is used. A section ends where the next located section
+        starts. The last one ends at the next heading on its level, usually References
+        or an appendix, and nothing after it is ever read.
+        """
+        entries = [(entry[0], entry[1], entry[2] - 1) for entry in toc if 1 <= entry[2] <= page_count]
+        levels = [level for level, title, _ in entries if self.classify_header(title) is not None]
+        if not levels:
+            return []
+        top_level = min(levels)
+
+        located = []
+        seen = set()
+        for index, (level, title, _) in enumerate(entries):
+            section_type = self.classify_header(title, seen) if level == top_level else None
+            if section_type is not None:
+                seen.add(section_type)
+                located.append((index, section_type))
+
+        sections = []
+        for n, (index, section_type) in enumerate(located):
+            if n + 1 < len(located):
+                end_index = located[n + 1][0]
+            else:
+                end_index = next((i for i in range(index + 1, len(entries)) if entries[i][0] <= top_level), None)
+            _, title, start_page = entries[index]
+            if end_index is None:
+                end_title, end_page = None, page_count - 1
+            else:
+                end_title, end_page = entries[end_index][1], entries[end_index][2]
+            sections.append((section_type, title, start_page, end_title, max(end_page, start_page)))
+        return sections
+
+    def _find_heading(self, text: str, title: str, start: int = 0):
+        """First occurrence of an outline title in page text, ignoring numbering, case and spacing"""
+        words = re.findall(r'\w+', NUMBERING_PATTERN.sub('', title))
+        if not words:
+            return None
+        return re.compile(r'\W+'.join(re.escape(word) for word in words), re.IGNORECASE).search(text, start)
+
+    def process_pdf_outline(self, pdf_path: str) -> Optional[Dict[str, str]]:
+        """Extract sections using the PDF's embedded outline, reading only the pages they span.
+
+        Each section runs from its heading to the next section's heading, both
+        found on their outline pages. Returns None when the document has no outline
+        entry matching a section type, so the caller can fall back to header detection.
+        """
+        doc = _open_pdf(pdf_path)
+        try:
+            page_count = doc.page_count if self.max_pages is None else min(doc.page_count, self.max_pages)
+            located = self.outline_sections(doc.get_toc(), page_count)
+            if not located:
+                return None
+
+            page_texts: Dict[int, str] = {}
+
+            def page_text(page_number: int) -> str:
+                if page_number not in page_texts:
+                    page_texts[page_number] = " ".join(doc[page_number].get_text("text").split())
+                return page_texts[page_number]
+
+            section_contents = {}
+            for section_type, title, start_page, end_title, end_page in located:
+                text = " ".join(page_text(page_number) for page_number in range(start_page, end_page + 1))
+                heading = self._find_heading(text, title, 0)
+                start = heading.end() if heading is not None and heading.start() < len(page_text(start_page)) else 0
+                end = len(text)
+                if end_title is not None:
+                    # The next heading sits on the last page, after this section's own heading
+                    next_heading = self._find_heading(text, end_title, max(start, len(text) - len(page_text(end_page))))
+                    if next_heading is not None:
+                        end = next_heading.start()
+                content = text[start:end]
+                if end < len(text):
+                    content = TRAILING_NUMBERING_PATTERN.sub('', content)
+                section_contents[section_type] = content.strip()[:self.max_section_chars]
+            self.last_stats = {
+                "pages": len(page_texts),
+                "page_count": doc.page_count,
+                "outline_sections": len(located)
+            }
+        finally:
+            doc.close()
+
+        return section_contents
+
+    def should_stream(self, pdf_path: str) -> bool:
+        """Whether process_pdf should use the streaming extractor for this file"""
+        if self.streaming is not None:
+            return self.streaming
+        doc = _open_pdf(pdf_path)
+        try:
+            return doc.page_count > self.streaming_page_threshold
+        finally:
+            doc.close()
+
+    def _keyword_matcher(self):
+        """Precompiled matcher for the current keyword table, rebuilt only when the table changes"""
+        snapshot = json.dumps(self.section_keywords, sort_keys=True)
+        if getattr(self, '_matcher_snapshot', None) != snapshot:
+            self._keyword_table = [
+                (keyword.lower(), section_type, priority)
+                for section_type, keywords in self.section_keywords.items()
+                for priority, keyword in enumerate(keywords)
+            ]
+            alternation = '|'.join(
+                re.escape(keyword)
+                for keyword in sorted({keyword for keyword, _, _ in self._keyword_table}, key=len, reverse=True)
+            )
+            self._keyword_pattern = re.compile(alternation or r'(?!)')
+            self._matcher_snapshot = snapshot
+        return self._keyword_pattern, self._keyword_table
+
+    def build_header_index(self, text: str) -> List[Tuple[int, int, str]]:
+        """Scan the ### header ### markers once, returning (start, content_start, lowercased header)"""
+        return [
+            (match.start(), match.end(), match.group(1).lower())
+            for match in HEADER_PATTERN.finditer(text)
+        ]
+
+    def identify_section_boundaries(self, text: str, header_index: Optional[List[Tuple[int, int, str]]] = None) -> Dict[str, tuple]:
         """Identify the start and end positions of each section"""
-        text = text.lower()
-        sections = {}
-        
-        # Find all potential section headers
-        for section_type, keywords in self.section_keywords.items():
-            for keyword in keywords:
-                matches = list(re.finditer(r'\n### .*?' + keyword + '.*? ###\n', text, re.IGNORECASE))
-                if matches:
-                    # Take the first occurrence of each section type
-                    if section_type not in sections:
-                        start_pos = matches[0].start()
-                        sections[section_type] = (start_pos, None)
-                    break
+        if header_index is None:
+            header_index = self.build_header_index(text)
+        keyword_pattern, keyword_table = self._keyword_matcher()
+
+        # For each section type keep the first header matching its highest-priority keyword
+        best = {}
+        for start, _, header in header_index:
+            if not keyword_pattern.search(header):
+                continue
+            for keyword, section_type, priority in keyword_table:
+                if keyword in header and (section_type not in best or priority < best[section_type][0]):
+                    best[section_type] = (priority, start)
+
+        sections = {
+            section_type: (best[section_type][1], None)
+            for section_type in self.section_keywords
+            if section_type in best
+        }
         
         # Sort sections by their start position
         sorted_sections = sorted(sections.items(), key=lambda x: x[1][0])
@@ -70,18 +331,31 @@ class PDFHandler:
 
     def extract_section_content(self, text: str, start: int, end: int) -> str:
         """Extract the content of a section given its boundaries"""
-        section_content = text[start:end].strip()
-        # Remove the section header
-        section_content = re.sub(r'\n### .*? ###\n', '', section_content, 1)
-        return section_content
+        # Skip the section's own header marker, which starts exactly at `start`
+        header = HEADER_PATTERN.match(text, start, end)
+        if header is not None:
+            start = header.end()
+        return text[start:end].strip()
 
     def process_pdf(self, pdf_path: str) -> Dict[str, str]:
         """Process a PDF file and return a dictionary of sections and their content"""
+        started_at = time.perf_counter()
+        if self.use_outline:
+            section_contents = self.process_pdf_outline(pdf_path)
+            if section_contents is not None:
+                self.last_stats["parse_seconds"] = time.perf_counter() - started_at
+                return section_contents
+
+        if self.should_stream(pdf_path):
+            section_contents = self.process_pdf_streaming(pdf_path)
+            self.last_stats["parse_seconds"] = time.perf_counter() - started_at
+            return section_contents
+
         # Extract text with formatting
         text = self.extract_text_with_formatting(pdf_path)
         
-        # Identify section boundaries
-        sections = self.identify_section_boundaries(text)
+        # Identify section boundaries from a single pass over the headers
+        sections = self.identify_section_boundaries(text, self.build_header_index(text))
         
         # Extract content for each section
         section_contents = {}
@@ -89,16 +363,38 @@ class PDFHandler:
             content = self.extract_section_content(text, start, end)
             section_contents[section_name] = content
         
+        self.last_stats["parse_seconds"] = time.perf_counter() - started_at
         return section_contents
 
+def _process_pdf_in_worker(handler: PDFHandler, pdf_path: str, connection):
+    """Entry point for extraction processes, which get a copy of the parent's PDFHandler but not its metrics.
+
+    Sends (sections, stats, None) on success or (None, None, error message) on failure.
+    """
+    try:
+        sections = handler.process_pdf(pdf_path)
+        connection.send((sections, handler.last_stats, None))
+    except Exception as e:
+        connection.send((None, None, str(e)))
+    finally:
+        connection.close()
+
 class PDFBatchProcessor:
-    def __init__(self):
+    def __init__(self,
+                 max_files: int = MAX_PDF_FILES,
+                 max_workers: int = PDF_EXTRACTION_WORKERS,
+                 timeout: Optional[float] = PDF_EXTRACTION_TIMEOUT,
+                 cache: Optional[ExtractionCache] = None):
         self.pdf_handler = PDFHandler()
+        self.cache = cache if cache is not None else ExtractionCache()
+        self.max_files = max_files
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.errors: Dict[str, str] = {}
         os.makedirs(TEMP_DIR, exist_ok=True)
 
-    def process_uploaded_files(self, files: List[str]) -> Dict[str, List[str]]:
-        """Process multiple PDF files and organize their sections"""
-        all_sections = {
+    def _empty_sections(self) -> Dict[str, List[str]]:
+        return {
             'introduction': [],
             'background': [],
             'methodology': [],
@@ -107,18 +403,144 @@ class PDFBatchProcessor:
             'conclusion': []
         }
 
+    def _merge_sections(self, all_sections: Dict[str, List[str]], sections: Dict[str, str]):
+        for section_name, content in sections.items():
+            if section_name in all_sections:
+                all_sections[section_name].append(content)
+
+    def process_uploaded_files(self, files: List[str]) -> Dict[str, List[str]]:
+        """Process multiple PDF files and organize their sections; per-file failures end up in self.errors"""
+        all_sections, self.errors = self.process_files(files)
+        return all_sections
+
+    def process_files(self, files: List[str]) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+        """Process multiple PDF files, returning their grouped sections and per-file errors"""
+        results, errors = self.extract_files(files)
+        all_sections = self._empty_sections()
+        for file_path in files:
+            if file_path in results:
+                self._merge_sections(all_sections, results[file_path])
+
+        return all_sections, errors
+
+    def extract_files(self, files: List[str]) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+        """Extract the sections of each PDF file, returning them per file along with per-file errors.
+
+        Files already in the extraction cache are not re-parsed. The rest are parsed
+        in worker processes when more than one worker or a timeout is configured,
+        otherwise in this process. Failures are collected instead of aborting the
+        batch, and nothing is kept on the instance, so concurrent jobs can share one
+        processor.
+        """
+        errors: Dict[str, str] = {}
+        results: Dict[str, Dict[str, str]] = {}
+        cache_keys: Dict[str, str] = {}
+        pending = []
+
         for file_path in files:
             try:
-                sections = self.pdf_handler.process_pdf(file_path)
-                for section_name, content in sections.items():
-                    if section_name in all_sections:
-                        all_sections[section_name].append(content)
-            except Exception as e:
-                print(f"Error processing {file_path}: {str(e)}")
+                key = self.cache.make_key(file_path, self.pdf_handler.extractor_version)
+            except OSError as e:
+                errors[file_path] = str(e)
                 continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                get_metrics().inc("pdf_files_total", status="cached")
+                results[file_path] = cached
+            else:
+                cache_keys[file_path] = key
+                pending.append(file_path)
 
-        return all_sections
+        if pending and (self.timeout is not None or (self.max_workers > 1 and len(pending) > 1)):
+            parsed = self._process_in_workers(pending, errors)
+        else:
+            parsed = {}
+            for file_path in pending:
+                try:
+                    parsed[file_path] = self.pdf_handler.process_pdf(file_path)
+                    self._record_parse(file_path, self.pdf_handler.last_stats)
+                except Exception as e:
+                    errors[file_path] = str(e)
+
+        metrics = get_metrics()
+        for file_path, error in errors.items():
+            metrics.inc("pdf_files_total", status="error")
+            metrics.event("pdf_error", file=file_path, error=error)
+
+        for file_path, sections in parsed.items():
+            self.cache.put(cache_keys[file_path], sections)
+            results[file_path] = sections
+
+        return results, errors
+
+    def _process_in_workers(self, files: List[str], errors: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+        """Parse files in up to max_workers processes, returning the sections of each file that succeeded.
+
+        Each file gets its own process and a deadline of self.timeout seconds from
+        the moment it starts, so files waiting for a free worker aren't charged for
+        the wait. A process still running at its deadline is terminated, which frees
+        its slot for the next file.
+        """
+        parsed = {}
+        queue = deque(files)
+        running = {}  # receiving end of the worker's pipe -> (file path, process, deadline)
+        workers = max(1, min(self.max_workers, len(files)))
+        try:
+            while queue or running:
+                while queue and len(running) < workers:
+                    file_path = queue.popleft()
+                    receiver, sender = multiprocessing.Pipe(duplex=False)
+                    process = multiprocessing.Process(target=_process_pdf_in_worker, args=(self.pdf_handler, file_path, sender))
+                    process.start()
+                    sender.close()
+                    deadline = None if self.timeout is None else time.monotonic() + self.timeout
+                    running[receiver] = (file_path, process, deadline)
+
+                deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                for receiver in wait(list(running), timeout):
+                    file_path, process, _ = running.pop(receiver)
+                    try:
+                        sections, stats, error = receiver.recv()
+                    except EOFError:
+                        sections, stats, error = None, None, None
+                    receiver.close()
+                    process.join()
+                    if sections is None and error is None:
+                        error = f"Extraction process exited with code {process.exitcode}"
+                    if error is not None:
+                        errors[file_path] = error
+                    else:
+                        parsed[file_path] = sections
+                        self._record_parse(file_path, stats)
+
+                now = time.monotonic()
+                for receiver, (file_path, process, deadline) in list(running.items()):
+                    # A worker whose result is already waiting in the pipe made it in time
+                    if deadline is not None and now >= deadline and not receiver.poll():
+                        del running[receiver]
+                        self._stop_worker(receiver, process)
+                        errors[file_path] = f"Timed out after {self.timeout} seconds"
+        finally:
+            for receiver, (_, process, _) in running.items():
+                self._stop_worker(receiver, process)
+
+        return parsed
+
+    def _stop_worker(self, receiver, process):
+        receiver.close()
+        process.terminate()
+        process.join()
+
+    def _record_parse(self, file_path: str, stats: Dict[str, float]):
+        metrics = get_metrics()
+        pages = stats.get("pages", 0)
+        metrics.inc("pdf_files_total", status="parsed")
+        metrics.observe("pdf_parse_seconds", stats.get("parse_seconds", 0.0))
+        if pages and "spans" in stats:
+            metrics.observe("pdf_spans_per_page", stats["spans"] / pages, buckets=COUNT_BUCKETS)
+        metrics.event("pdf_parsed", file=file_path, **stats)
 
     def validate_pdf_count(self, files: List[str]) -> bool:
         """Validate that the number of PDFs is within the acceptable range"""
-        return 1 <= len(files) <= 10
\ No newline at end of file
+        return 1 <= len(files) <= self.max_files
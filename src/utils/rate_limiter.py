@@ -1,52 +1,112 @@
 import time
-from functools import wraps
-from typing import Callable
+from typing import Dict, Optional
 import asyncio
-from datetime import datetime, timedelta
-from config.settings import RETRY_ATTEMPTS, RETRY_DELAY
-import queue
+import threading
+from .metrics import get_metrics
+
+class TokenBucket:
+    """Continuously refilling bucket; not thread-safe on its own, RateLimiter holds the lock"""
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.available = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.available = min(self.capacity, self.available + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (call refill first)"""
+        missing = amount - self.available
+        return 0.0 if missing <= 0 else missing / self.refill_per_second
 
 class RateLimiter:
-    def __init__(self, requests_per_minute):
+    """Thread-safe, asyncio-aware limiter enforcing requests- and tokens-per-minute budgets.
+
+    A single instance can be shared by several agents and jobs: use acquire() from
+    threads and await acquire_async() from coroutines. Callers waiting on the limiter
+    sleep and then re-check, so concurrent waiters never overdraw the budget.
+    """
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None, name: str = "default"):
+        self.name = name
         self.requests_per_minute = requests_per_minute
-        self.requests = queue.Queue(maxsize=requests_per_minute)
-        self.window_size = 60
-
-    def acquire(self):
-        now = datetime.now()
-
-        # Remove old timestamps
-        while not self.requests.empty():
-            timestamp = self.requests.queue[0]
-            if now - timestamp > timedelta(seconds=self.window_size):
-                self.requests.get()
-            else:
-                break
-        
-        # If we've hit the limit, wait
-        if self.requests.full():
-            oldest = self.requests.queue[0]
-            sleep_time = (oldest + timedelta(seconds=self.window_size) - now).total_seconds()
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-
-        # Add current request
-        self.requests.put(now)
-
-def rate_limit(func: Callable):
-    """Decorator to apply rate limiting to a function"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        max_retries = RETRY_ATTEMPTS
-        retry_delay = RETRY_DELAY
-
-        for attempt in range(max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if "429" in str(e) and attempt < max_retries - 1:
-                    print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                    time.sleep(retry_delay * (attempt+1)) # Exponential backoff
-                    continue
-                raise
-    return wrapper
\ No newline at end of file
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self.total_wait_time = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens if available, else return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._requests.refill(now)
+            wait = self._requests.wait_time(1)
+            if self._tokens is not None:
+                self._tokens.refill(now)
+                # A single request larger than the whole budget may still run once the bucket is full
+                tokens = min(tokens, self._tokens.capacity)
+                wait = max(wait, self._tokens.wait_time(tokens))
+            if wait > 0:
+                return wait
+
+            self._requests.available -= 1
+            if self._tokens is not None:
+                self._tokens.available -= tokens
+            return 0.0
+
+    def estimate_wait(self, tokens: int = 0, queued: int = 0) -> float:
+        """Seconds until a request would fit behind `queued` others, without reserving anything"""
+        with self._lock:
+            now = time.monotonic()
+            self._requests.refill(now)
+            wait = self._requests.wait_time(queued + 1)
+            if self._tokens is not None:
+                self._tokens.refill(now)
+                wait = max(wait, self._tokens.wait_time(min(tokens, self._tokens.capacity)))
+            return wait
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self.total_wait_time += waited
+        get_metrics().observe("rate_limiter_wait_seconds", waited, limiter=self.name)
+
+    def acquire(self, tokens: int = 0):
+        """Block the calling thread until the request fits in the budget"""
+        started_at = time.monotonic()
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                self._record_wait(time.monotonic() - started_at)
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait without blocking the event loop until the request fits in the budget"""
+        started_at = time.monotonic()
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                self._record_wait(time.monotonic() - started_at)
+                return
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token budget once the real usage of a request is known"""
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.available -= actual_tokens - estimated_tokens
+
+_shared_limiters: Dict[str, RateLimiter] = {}
+_shared_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None) -> RateLimiter:
+    """Return the process-wide limiter for a backend, creating it on first use"""
+    with _shared_limiters_lock:
+        if name not in _shared_limiters:
+            _shared_limiters[name] = RateLimiter(requests_per_minute, tokens_per_minute, name=name)
+        return _shared_limiters[name]
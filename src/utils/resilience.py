@@ -0,0 +1,285 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from .metrics import get_metrics
+from config.settings import (
+    RETRY_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    HEDGE_MIN_SAMPLES
+)
+
+T = TypeVar("T")
+
+RETRY_DELAY_PATTERN = re.compile(r"retry(?:[ _-]?delay\s*\{\s*seconds:|[ _-]?after:?| in)\s*([\d.]+)", re.IGNORECASE)
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while its circuit breaker is open"""
+
+def _status_code(error: Exception) -> Optional[int]:
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+def is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429 or "429" in str(error)
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, dropped connections and 5xx responses are worth retrying"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # openai and google client errors, matched by name so neither package has to be imported
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError", "DeadlineExceeded", "ServiceUnavailable"):
+        return True
+    status = _status_code(error)
+    return is_rate_limited(error) or (status is not None and 500 <= status < 600)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-suggested wait from a Retry-After header or a retry delay in the error message"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            if headers.get("retry-after-ms") is not None:
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after") is not None:
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            pass  # HTTP-date form; fall back to backoff
+    match = RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class CircuitBreaker:
+    """Stops calls to a backend after consecutive failures, probing again after reset_timeout.
+
+    closed -> open after failure_threshold failures in a row; open -> half-open once
+    reset_timeout has passed, letting a single probe through; the probe's outcome
+    closes or re-opens the circuit.
+    """
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_BREAKER_FAILURES,
+                 reset_timeout: float = CIRCUIT_BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+    def is_open(self) -> bool:
+        """Whether calls are being refused right now, without claiming the half-open probe"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def release_probe(self):
+        """Give up the half-open probe without an outcome, e.g. when the probing call was cancelled"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    get_metrics().inc("circuit_breaker_opened_total", backend=self.name)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_trackers: Dict[str, LatencyTracker] = {}
+_cooldowns: Dict[str, float] = {}
+_registry_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for a backend, creating it on first use"""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    with _registry_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+def start_cooldown(name: str, seconds: float):
+    """Note that a backend asked to be left alone (or is backing off) for the next `seconds`"""
+    with _registry_lock:
+        _cooldowns[name] = max(_cooldowns.get(name, 0.0), time.monotonic() + seconds)
+
+def cooldown_remaining(name: str) -> float:
+    with _registry_lock:
+        return max(0.0, _cooldowns.get(name, 0.0) - time.monotonic())
+
+class ResiliencePolicy:
+    """Timeouts, retries with backoff, a circuit breaker and optional hedging for one backend.
+
+    Retries wait for the server's Retry-After hint when there is one, otherwise for an
+    exponentially growing, jittered delay. Rate limits are retried but don't trip the
+    breaker; timeouts, connection errors and 5xx responses do. When hedge_percentile is
+    set, async calls still running after that percentile of recent latencies get a
+    duplicate request, and whichever finishes first wins.
+    """
+    def __init__(self,
+                 name: str,
+                 timeout: Optional[float] = None,
+                 max_attempts: int = RETRY_ATTEMPTS,
+                 base_delay: Optional[float] = None,
+                 max_delay: float = LLM_RETRY_MAX_DELAY,
+                 hedge_percentile: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = LLM_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.breaker = get_circuit_breaker(name)
+        self.latencies = get_latency_tracker(name)
+
+    def _on_failure(self, error: Exception, attempt: int) -> Optional[float]:
+        """Record a failed attempt; return how long to wait before retrying, or None to give up"""
+        metrics = get_metrics()
+        if is_rate_limited(error):
+            metrics.inc("llm_rate_limited_total", backend=self.name)
+        if is_retryable(error) and not is_rate_limited(error):
+            self.breaker.record_failure()
+        else:
+            # The backend answered, even if only to refuse the request
+            self.breaker.record_success()
+        if not is_retryable(error):
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+        # Lets a ModelRouter steer other calls away while this backend backs off
+        start_cooldown(self.name, delay)
+        if attempt >= self.max_attempts - 1:
+            return None
+        metrics.inc("llm_retries_total", backend=self.name)
+        print(f"{self.name} call failed ({error}), retrying in {delay:.1f} seconds...")
+        return delay
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run a blocking call with retries; the timeout must be enforced by the client itself"""
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            started_at = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._on_failure(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            self.latencies.record(time.perf_counter() - started_at)
+            return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run a coroutine factory with a timeout, retries and optional hedging"""
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            started_at = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._hedged(fn), self.timeout)
+            except Exception as e:
+                delay = self._on_failure(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # A cancelled probe has no outcome; free it so the next call can probe instead
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            self.latencies.record(time.perf_counter() - started_at)
+            return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        threshold = self.latencies.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        if threshold is None:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=threshold)
+        if done:
+            return primary.result()
+
+        get_metrics().inc("llm_hedged_requests_total", backend=self.name)
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            get_metrics().inc("llm_hedge_wins_total", backend=self.name)
+                        return task.result()
+                if not pending:
+                    # Both failed; surface the primary's error
+                    return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
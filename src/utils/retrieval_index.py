@@ -0,0 +1,207 @@
+import re
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional, Union
+import numpy as np
+from .token_utils import split_text
+from config.settings import (
+    RETRIEVAL_CHUNK_TOKENS,
+    RETRIEVAL_HASH_DIM,
+    RETRIEVAL_EMBEDDING_MODEL
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words describing what each section type is about, added to the retrieval query
+SECTION_QUERY_TERMS = {
+    'introduction': "introduction motivation problem challenge contribution overview goal",
+    'background': "background related work prior literature existing approaches previous studies",
+    'methodology': "method approach model architecture algorithm proposed framework training",
+    'results': "results experiments evaluation accuracy performance dataset benchmark comparison",
+    'discussion': "discussion analysis limitations implications insights observations",
+    'conclusion': "conclusion summary future work findings contributions"
+}
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+class Passage:
+    """A chunk of one paper's section text"""
+    def __init__(self, text: str, section: str, source: int, position: int):
+        self.text = text
+        self.section = section
+        self.source = source
+        self.position = position
+
+class SparseVectors:
+    """Rows of a sparse matrix in CSR form: row i's nonzeros are data[indptr[i]:indptr[i + 1]] at columns indices[...]"""
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row_sums(self, values: np.ndarray) -> np.ndarray:
+        """Sum of `values`, aligned with data, over each row"""
+        sums = np.zeros(len(self), dtype=np.float32)
+        starts = self.indptr[:-1]
+        nonempty = starts < self.indptr[1:]
+        if nonempty.any():
+            sums[nonempty] = np.add.reduceat(values, starts[nonempty])
+        return sums
+
+    def normalize(self):
+        norms = np.sqrt(self.row_sums(self.data * self.data))
+        self.data /= np.maximum(np.repeat(norms, np.diff(self.indptr)), 1e-12)
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """Product of every row with a dense vector"""
+        return self.row_sums(self.data * vector[self.indices])
+
+def _hash_term(term: str, dim: int) -> int:
+    # crc32 rather than hash() so vectors are stable across processes
+    return zlib.crc32(term.encode("utf-8")) % dim
+
+def build_query(section_name: str, research_area: str = "") -> str:
+    """Retrieval query for a section type within a research area"""
+    return " ".join([section_name, SECTION_QUERY_TERMS.get(section_name, ""), research_area])
+
+class RetrievalIndex:
+    """In-memory passage index over extracted PDF sections.
+
+    Passages are scored with hashed TF-IDF vectors by default, or with a local
+    embedding model when embed_fn is given. TF-IDF vectors are kept sparse, costing
+    a few bytes per distinct term in a passage rather than `dim` floats. Vectors are
+    L2-normalized, so a search is a single matrix-vector product.
+    """
+    def __init__(self,
+                 chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS,
+                 dim: int = RETRIEVAL_HASH_DIM,
+                 embed_fn: Optional[EmbedFn] = None):
+        self.chunk_tokens = chunk_tokens
+        self.dim = dim
+        self.embed_fn = embed_fn
+        self.passages: List[Passage] = []
+        # SparseVectors for TF-IDF, a dense (passages x embedding size) array for embeddings
+        self._vectors: Optional[Union[SparseVectors, np.ndarray]] = None
+        self._idf: Optional[np.ndarray] = None
+
+    def add(self, section: str, contents: List[str]):
+        """Chunk one section's contents, one entry per paper, into passages"""
+        for source, content in enumerate(contents):
+            for position, piece in enumerate(split_text(content, self.chunk_tokens)):
+                self.passages.append(Passage(piece, section, source, position))
+        self._vectors = None
+
+    @classmethod
+    def from_sections(cls, all_sections: Dict[str, List[str]], **kwargs) -> "RetrievalIndex":
+        index = cls(**kwargs)
+        for section, contents in all_sections.items():
+            index.add(section, contents)
+        index.build()
+        return index
+
+    def _term_counts(self, texts: List[str]) -> SparseVectors:
+        indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+        indices, counts = [], []
+        for row, text in enumerate(texts):
+            columns = np.fromiter((_hash_term(term, self.dim) for term in TOKEN_PATTERN.findall(text.lower())),
+                                  dtype=np.int32)
+            unique, count = np.unique(columns, return_counts=True)
+            indices.append(unique)
+            counts.append(count.astype(np.float32))
+            indptr[row + 1] = indptr[row] + len(unique)
+        return SparseVectors(indptr, np.concatenate(indices), np.concatenate(counts))
+
+    def _tfidf(self, texts: List[str], counts: Optional[SparseVectors] = None) -> SparseVectors:
+        vectors = self._term_counts(texts) if counts is None else counts
+        # Sublinear term frequency keeps long passages from dominating
+        np.log1p(vectors.data, out=vectors.data)
+        vectors.data *= self._idf[vectors.indices]
+        vectors.normalize()
+        return vectors
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def build(self):
+        """Compute IDF weights and passage vectors"""
+        texts = [passage.text for passage in self.passages]
+        if self.embed_fn is not None:
+            self._vectors = self._embed(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+            return
+        if not texts:
+            self._vectors = SparseVectors(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                                          np.zeros(0, dtype=np.float32))
+            return
+        counts = self._term_counts(texts)
+        document_frequency = np.bincount(counts.indices, minlength=self.dim)
+        self._idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self._vectors = self._tfidf(texts, counts)
+
+    def _scores(self, query: str) -> np.ndarray:
+        """Similarity of every passage to the query"""
+        if self.embed_fn is not None:
+            return self._vectors @ self._embed([query])[0]
+        query_vector = np.zeros(self.dim, dtype=np.float32)
+        sparse_query = self._tfidf([query])
+        query_vector[sparse_query.indices] = sparse_query.data
+        return self._vectors.dot(query_vector)
+
+    def search(self,
+               query: str,
+               k: int,
+               section: Optional[str] = None,
+               max_per_source: Optional[int] = None) -> List[Passage]:
+        """Top-k passages for the query, optionally within one section and capped per paper"""
+        if self._vectors is None:
+            self.build()
+        candidates = [i for i, passage in enumerate(self.passages) if section is None or passage.section == section]
+        if not candidates:
+            return []
+        scores = self._scores(query)[candidates]
+
+        selected = []
+        per_source: Dict[int, int] = {}
+        for rank in np.argsort(-scores, kind="stable"):
+            passage = self.passages[candidates[rank]]
+            if max_per_source is not None and per_source.get(passage.source, 0) >= max_per_source:
+                continue
+            per_source[passage.source] = per_source.get(passage.source, 0) + 1
+            selected.append(passage)
+            if len(selected) == k:
+                break
+        return selected
+
+_embed_fn: Optional[EmbedFn] = None
+_embed_lock = threading.Lock()
+
+def get_embedding_fn(model_name: Optional[str] = RETRIEVAL_EMBEDDING_MODEL) -> Optional[EmbedFn]:
+    """Mean-pooled sentence embeddings from a local transformers model, if one is configured"""
+    global _embed_fn
+    if not model_name:
+        return None
+    if _embed_fn is None:
+        with _embed_lock:
+            if _embed_fn is None:
+                import torch
+                from transformers import AutoModel, AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                model = AutoModel.from_pretrained(model_name).eval()
+
+                def embed(texts: List[str], batch_size: int = 32) -> np.ndarray:
+                    pooled = []
+                    with torch.no_grad():
+                        for start in range(0, len(texts), batch_size):
+                            batch = tokenizer(texts[start:start + batch_size], padding=True,
+                                              truncation=True, return_tensors="pt")
+                            hidden = model(**batch).last_hidden_state
+                            mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                            pooled.append(((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)).numpy())
+                    return np.concatenate(pooled)
+
+                _embed_fn = embed
+    return _embed_fn
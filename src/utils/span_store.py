@@ -0,0 +1,132 @@
+from typing import Dict, List, Optional
+import numpy as np
+from config.settings import (
+    HEADER_SIZE_RATIO,
+    HEADER_MAX_CHARS,
+    HEADER_MAX_BOLD_FRACTION
+)
+
+BOLD_FLAG = 2 ** 4
+
+class SpanStore:
+    """Columnar store of a document's text spans.
+
+    Span texts are concatenated into one string addressed through an offset table,
+    and font size, flags, page number and bounding box live in parallel NumPy
+    arrays, so a document costs a few dozen bytes per span beyond its text.
+    """
+    def __init__(self,
+                 text: str,
+                 offsets: np.ndarray,
+                 size: np.ndarray,
+                 flags: np.ndarray,
+                 page: np.ndarray,
+                 bbox: np.ndarray,
+                 pages: int):
+        self.text = text
+        self.offsets = offsets
+        self.size = size
+        self.flags = flags
+        self.page = page
+        self.bbox = bbox
+        self.pages = pages
+
+    @classmethod
+    def from_document(cls, doc, max_pages: Optional[int] = None) -> "SpanStore":
+        """Read every span of an open PyMuPDF document, one page at a time"""
+        stop = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        return cls.from_pages(doc, 0, stop)
+
+    @classmethod
+    def from_pages(cls, doc, start: int, stop: int) -> "SpanStore":
+        """Read the spans of pages start..stop-1 of an open PyMuPDF document"""
+        # Columns are converted to arrays page by page so Python objects never outlive a page
+        page_texts: List[str] = []
+        columns: Dict[str, List[np.ndarray]] = {"lengths": [], "size": [], "flags": [], "page": [], "bbox": []}
+        page_count = 0
+        for page_number in range(start, stop):
+            page = doc[page_number]
+            page_count += 1
+            spans = [
+                span
+                for block in page.get_text("dict")["blocks"]
+                for line in block.get("lines", ())
+                for span in line["spans"]
+            ]
+            page_texts.append("".join(span["text"] for span in spans))
+            columns["lengths"].append(np.fromiter((len(span["text"]) for span in spans), dtype=np.int64, count=len(spans)))
+            columns["size"].append(np.fromiter((span["size"] for span in spans), dtype=np.float32, count=len(spans)))
+            columns["flags"].append(np.fromiter((span["flags"] for span in spans), dtype=np.int32, count=len(spans)))
+            columns["page"].append(np.full(len(spans), page_number, dtype=np.int32))
+            columns["bbox"].append(np.asarray([span["bbox"] for span in spans], dtype=np.float32).reshape(-1, 4))
+
+        def concatenate(name: str, dtype, shape=(0,)) -> np.ndarray:
+            return np.concatenate(columns[name]) if columns[name] else np.zeros(shape, dtype=dtype)
+
+        lengths = concatenate("lengths", np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            "".join(page_texts),
+            offsets,
+            concatenate("size", np.float32),
+            concatenate("flags", np.int32),
+            concatenate("page", np.int32),
+            concatenate("bbox", np.float32, (0, 4)),
+            page_count
+        )
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def span_text(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def body_font_size(self) -> float:
+        """Font size carrying the most characters, i.e. the body text size"""
+        if not len(self):
+            return 0.0
+        sizes, inverse = np.unique(np.round(self.size, 1), return_inverse=True)
+        return float(sizes[np.argmax(np.bincount(inverse, weights=self.lengths()))])
+
+    def bold_fraction(self) -> float:
+        """Fraction of the characters set in bold"""
+        lengths = self.lengths()
+        return float(lengths[(self.flags & BOLD_FLAG) != 0].sum() / max(lengths.sum(), 1))
+
+    def classify_headers(self,
+                         size_ratio: float = HEADER_SIZE_RATIO,
+                         max_chars: int = HEADER_MAX_CHARS,
+                         max_bold_fraction: float = HEADER_MAX_BOLD_FRACTION,
+                         body_size: Optional[float] = None,
+                         bold_fraction: Optional[float] = None) -> np.ndarray:
+        """Boolean mask of spans that look like headers, with thresholds adapted to the document.
+
+        A header is a short span set noticeably larger than the body text, or in bold
+        at body size or above when bold is rare enough in the document to stand out.
+        body_size and bold_fraction default to this store's own, and can be passed in
+        when the store holds only part of a document.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=bool)
+        lengths = self.lengths()
+        if body_size is None:
+            body_size = self.body_font_size()
+        if bold_fraction is None:
+            bold_fraction = self.bold_fraction()
+        bold = (self.flags & BOLD_FLAG) != 0
+
+        candidate = (lengths > 0) & (lengths <= max_chars)
+        larger = self.size >= body_size * size_ratio
+        if bold_fraction <= max_bold_fraction:
+            larger |= bold & (self.size >= body_size - 0.5)
+        mask = candidate & larger
+
+        # Drop candidates with no letters (page numbers, equation fragments); only the few candidates are inspected
+        for i in np.flatnonzero(mask):
+            if not any(c.isalpha() for c in self.span_text(i)):
+                mask[i] = False
+        return mask
@@ -0,0 +1,44 @@
+from typing import List
+
+# Rough average for English prose with both Gemini and Qwen-style tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate that avoids loading a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """Split text into pieces of at most max_tokens, preferring paragraph and sentence breaks"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n\n", 0, max_chars)
+        if cut <= 0:
+            cut = text.rfind(". ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:]
+    if text.strip():
+        pieces.append(text.strip())
+    return pieces
+
+def pack_by_budget(texts: List[str], max_tokens: int) -> List[List[str]]:
+    """Greedily group texts into chunks whose estimated size fits max_tokens.
+
+    Texts larger than the budget on their own are split first.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        for piece in split_text(text, max_tokens):
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(current)
+    return chunks
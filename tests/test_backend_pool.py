@@ -0,0 +1,29 @@
+import asyncio
+import unittest
+from src.agents.backend_pool import BackendPool
+
+class BackendPoolCancellationTest(unittest.TestCase):
+    def test_cancelled_calls_free_their_slots(self):
+        pool = BackendPool(["http://a/v1", "http://b/v1"], max_concurrency_per_endpoint=2, poll_interval=0.01)
+
+        async def hang(backend):
+            await asyncio.sleep(60)
+
+        async def answer(backend):
+            return backend.base_url
+
+        async def run():
+            # Fill every slot with calls that time out, as a wait_for deadline or a losing hedge would
+            for result in await asyncio.gather(
+                *(asyncio.wait_for(pool.call_async(hang), 0.05) for _ in range(4)),
+                return_exceptions=True
+            ):
+                self.assertIsInstance(result, asyncio.TimeoutError)
+            self.assertEqual(pool.outstanding(), 0)
+            return await asyncio.wait_for(pool.call_async(answer), 1.0)
+
+        self.assertIn(asyncio.run(run()), ("http://a/v1", "http://b/v1"))
+        self.assertTrue(all(backend.healthy for backend in pool.backends))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import asyncio
+import unittest
+from src.utils.resilience import CircuitBreaker, ResiliencePolicy
+
+class CircuitBreakerProbeTest(unittest.TestCase):
+    def test_cancelled_probe_lets_the_next_call_probe(self):
+        policy = ResiliencePolicy("test-cancelled-probe", max_attempts=1)
+        policy.breaker = CircuitBreaker("test-cancelled-probe", failure_threshold=1, reset_timeout=0.0)
+        policy.breaker.record_failure()
+
+        async def hang():
+            await asyncio.sleep(60)
+
+        async def answer():
+            return "ok"
+
+        async def run():
+            # The half-open probe is cancelled from outside, as a hedge loser or an outer timeout would be
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(policy.call_async(hang), 0.05)
+            return await policy.call_async(answer)
+
+        self.assertEqual(asyncio.run(run()), "ok")
+        self.assertEqual(policy.breaker.state, "closed")
+
+if __name__ == "__main__":
+    unittest.main()